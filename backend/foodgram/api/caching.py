@@ -0,0 +1,105 @@
+from calendar import timegm
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from recipes.models import ChangeVersion
+
+
+def get_versions(request, names):
+    '''Версии данных {name: (value, updated_at)}, читаются раз за запрос.'''
+    versions = getattr(request, '_change_versions', None)
+    if versions is None:
+        versions = request._change_versions = {}
+    missing = [name for name in names if name not in versions]
+    if missing:
+        versions.update(dict.fromkeys(missing, (0, None)))
+        versions.update(
+            (name, (value, updated_at))
+            for name, value, updated_at in ChangeVersion.objects
+            .filter(name__in=missing)
+            .values_list('name', 'value', 'updated_at')
+        )
+    return {name: versions[name] for name in names}
+
+
+def get_request_signature(request):
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    return f'{request.get_host()}{request.path}?{query}'
+
+
+def get_cache_key(request, version_name, version):
+    digest = md5(get_request_signature(request).encode()).hexdigest()
+    return f'{version_name}:{version}:{digest}'
+
+
+def cache_anonymous_response(version_name):
+    '''Кэширует ответ метода viewset для анонимных пользователей.
+
+    В ключ входят путь и параметры запроса, а также текущая версия
+    данных version_name: любое изменение данных увеличивает версию,
+    и старые записи кэша больше не читаются.
+    '''
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not request.user.is_anonymous:
+                return method(self, request, *args, **kwargs)
+            cache = caches[settings.RESPONSE_CACHE_ALIAS]
+            version, _ = get_versions(request, [version_name])[version_name]
+            key = get_cache_key(request, version_name, version)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_response(*version_names, per_user=False):
+    '''Условные GET-запросы по версиям данных (ETag и Last-Modified).
+
+    Если клиент прислал актуальные If-None-Match или If-Modified-Since,
+    возвращается 304 без обращения к данным и сериализации. При
+    per_user=True учитывается и версия личных данных пользователя.
+    '''
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            names = list(version_names)
+            if per_user and request.user.is_authenticated:
+                names.append(ChangeVersion.for_user(request.user.pk))
+            versions = get_versions(request, names)
+            etag = quote_etag(md5(
+                f'{sorted(versions.items())}:{request.user.pk}:'
+                f'{get_request_signature(request)}'.encode()
+            ).hexdigest())
+            modified = [updated_at for _, updated_at in versions.values()
+                        if updated_at is not None]
+            last_modified = (timegm(max(modified).utctimetuple())
+                             if modified else None)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
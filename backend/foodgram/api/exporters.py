@@ -0,0 +1,82 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from api.utils import iter_shopping_list
+
+CHUNK_SIZE = 500
+FILENAME = 'shopping_list'
+TITLE = 'Список покупок'
+
+PDF_FONT = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class Echo:
+    '''Псевдобуфер для csv.writer: возвращает строку вместо записи.'''
+
+    def write(self, value):
+        return value
+
+
+def export_txt(user):
+    yield f'{TITLE}\n\n'
+    for name, amount, unit in iter_shopping_list(user, CHUNK_SIZE):
+        yield f'{name} - {amount} {unit}\n'
+
+
+def export_csv(user):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(
+        ('Ингредиент', 'Количество', 'Единица измерения'))
+    for row in iter_shopping_list(user, CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def export_pdf(user):
+    '''PDF собирается целиком: таблица ссылок пишется в конец файла.'''
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT, settings.SHOPPING_LIST_PDF_FONT))
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - PDF_MARGIN
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE + 4)
+    pdf.drawString(PDF_MARGIN, y, TITLE)
+    y -= PDF_LINE_HEIGHT * 2
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+    for name, amount, unit in iter_shopping_list(user, CHUNK_SIZE):
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, f'{name} - {amount} {unit}')
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(CHUNK_SIZE * 16), b'')
+
+
+EXPORTERS = {
+    'txt': (export_txt, 'text/plain; charset=utf-8'),
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'pdf': (export_pdf, 'application/pdf'),
+}
+
+
+def shopping_list_response(user, file_format):
+    exporter, content_type = EXPORTERS[file_format]
+    response = StreamingHttpResponse(exporter(user),
+                                     content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{file_format}"')
+    return response
@@ -1,6 +1,10 @@
 from django_filters.rest_framework import FilterSet, filters, CharFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
 
-from recipes.models import Recipe, Ingredient
+from api.caching import get_versions
+from recipes.models import ChangeVersion, Recipe, Ingredient
+from recipes.search import search_recipes
+from recipes.services import filter_by_tags, get_tag_ids
 
 
 class IngredientFilter(FilterSet):
@@ -12,7 +16,7 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(method='filter_tags')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -22,6 +26,20 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
+    def __init__(self, data=None, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        self.tag_ids = {}
+        if 'tags' in self.data:
+            version, _ = get_versions(
+                self.request, [ChangeVersion.TAGS])[ChangeVersion.TAGS]
+            self.tag_ids = get_tag_ids(version)
+        self.filters['tags'].extra['choices'] = [
+            (slug, slug) for slug in self.tag_ids]
+
+    def filter_tags(self, queryset, name, value):
+        return filter_by_tags(queryset, [self.tag_ids[slug]
+                                         for slug in value])
+
     def filter_is_favorited(self, queryset, name, value):
         if value:
             user = self.request.user
@@ -35,3 +53,20 @@ class RecipeFilter(FilterSet):
             if user.is_authenticated:
                 return queryset.filter(cart__user=user)
         return queryset
+
+
+class RecipeSearchFilter(SearchFilter):
+    '''Полнотекстовый поиск по названию, описанию, тегам и ингредиентам.
+
+    Без явного ?ordering= результаты сортируются по релевантности,
+    поэтому фильтр должен стоять после OrderingFilter.
+    '''
+
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        queryset = search_recipes(queryset, query)
+        if OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by('-search_rank', '-id')
+        return queryset
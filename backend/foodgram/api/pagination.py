@@ -0,0 +1,53 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PageLimitPagination(PageNumberPagination):
+    '''Постраничная пагинация, размер страницы задаётся параметром limit.'''
+    page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size_query_param = 'limit'
+
+
+class CursorSwitchPagination(PageLimitPagination):
+    '''Постраничная пагинация с переключением на курсорную.
+
+    Если в запросе есть параметр cursor (в том числе пустой — первая
+    страница), выдача идёт по ключу сортировки без OFFSET и COUNT(*),
+    иначе — обычными страницами ?page=&limit=.
+    '''
+    cursor_pagination_class = None
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class RecipePagination(CursorSwitchPagination):
+    cursor_pagination_class = RecipeCursorPagination
+
+
+class UserPagination(CursorSwitchPagination):
+    cursor_pagination_class = UserCursorPagination
@@ -0,0 +1,37 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    '''Базовый рендерер форматов выгрузки списка покупок.
+
+    Сам файл отдаётся потоком из api.exporters, рендерер нужен для
+    согласования формата (?format=txt|csv|pdf или заголовок Accept)
+    и для ответов с ошибками.
+    '''
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode('utf-8')
+
+
+class TextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+SHOPPING_LIST_RENDERERS = (TextRenderer, CSVRenderer, PDFRenderer)
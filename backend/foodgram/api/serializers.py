@@ -1,26 +1,80 @@
 import base64
+import binascii
+from collections import Counter
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from djoser.serializers import UserSerializer as DjoserUserSerialiser
 from rest_framework import serializers
 
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingList, Tag)
-from users.models import Subscriber, User
+from api.utils import (MAX_ID, get_recipes_limit, get_requested_fields,
+                       get_subscribed_authors)
+from recipes.images import schedule_image_variants, variant_urls
+from recipes.models import (ChangeVersion, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingList, Tag)
+from recipes.search import reindex_recipes
+from recipes.services import recipe_ingredients_changed
+from users.models import User
 
 
 class Base64ImageField(serializers.ImageField):
+    '''Картинка в виде data URI.
+
+    Base64 раскодируется кусками во временный файл, который уходит
+    на диск, если становится большим. Размер проверяется до
+    раскодирования.
+    '''
+
+    CHUNK_SIZE = 64 * 1024
+    SPOOL_SIZE = 2 ** 20
+
+    default_error_messages = {
+        'too_large': 'Размер картинки не должен превышать {max_size} байт.',
+        'invalid_base64': 'Картинка передана в некорректном base64.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, _, imgstr = data.partition(';base64,')
             ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-
+            data = File(self.decode(imgstr), name='temp.' + ext)
         return super().to_internal_value(data)
 
+    def decode(self, imgstr):
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(imgstr) // 4 * 3 - imgstr[-2:].count('=') > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+        try:
+            for start in range(0, len(imgstr), self.CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    imgstr[start:start + self.CHUNK_SIZE], validate=True))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        return file
+
+
+class SparseFieldsMixin:
+    '''Оставляет в ответе поля из ?fields= и убирает поля из ?omit=.
+
+    Действует только на сериализатор, созданный во view с запросом
+    в контексте; вложенные сериализаторы выводятся целиком.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        requested = set(get_requested_fields(request, self.fields))
+        for field in set(self.fields) - requested:
+            self.fields.pop(field)
+
 
 class UserCreateSerializer(UserCreateSerializer):
 
@@ -30,19 +84,20 @@ class UserCreateSerializer(UserCreateSerializer):
                   'first_name', 'last_name', 'password',)
 
 
-class UserSerializer(DjoserUserSerialiser):
-    is_subscriber = serializers.BooleanField(read_only=True)
+class UserSerializer(SparseFieldsMixin, DjoserUserSerialiser):
+    is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username',
-                  'first_name', 'last_name', 'password', 'is_subscriber')
+                  'first_name', 'last_name', 'password', 'is_subscribed')
+        extra_kwargs = {'password': {'write_only': True}}
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
+        request = self.context.get('request')
+        if request is None or obj.id == request.user.id:
             return False
-        return Subscriber.objects.filter(user=user, author=obj.id).exists()
+        return obj.id in get_subscribed_authors(request)
 
 
 class SubscriberRecipeSerializer(serializers.ModelSerializer):
@@ -59,7 +114,7 @@ class SubscribeSerializer(UserSerializer):
     last_name = serializers.ReadOnlyField()
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='author.recipes.count')
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -68,18 +123,23 @@ class SubscribeSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count'
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return Subscriber.objects.filter(user=user, author=obj).exists()
-
     def get_recipes(self, obj):
-        limit = 3
-        recipes = Recipe.objects.filter(author=obj)[:limit]
+        author_recipes = self.context.get('author_recipes')
+        if author_recipes is not None:
+            recipes = author_recipes.get(obj.id, [])
+        else:
+            limit = get_recipes_limit(self.context['request'])
+            recipes = Recipe.objects.filter(author=obj)[:limit]
         serializer = SubscriberRecipeSerializer(recipes, many=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipe_author.all().count()
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_ID),
+        allow_empty=False,
+        max_length=1000
+    )
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -106,26 +166,34 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = UserSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(source='ingredientrecipe_set',
                                              many=True, read_only=True)
-    is_favorited = serializers.BooleanField(default=False)
-    is_in_shopping_cart = serializers.BooleanField(default=False)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time'
+                  'name', 'image', 'image_variants', 'text', 'cooking_time'
                   )
 
+    def get_is_favorited(self, obj):
+        return obj.id in self.context.get('favorited_recipes', ())
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.context.get('carted_recipes', ())
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
+
 
 class AddIngredientRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.SlugRelatedField(
-        source='ingredient', slug_field='id', queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient_id', min_value=1)
     amount = serializers.IntegerField(write_only=True, min_value=1)
 
     class Meta:
@@ -163,17 +231,23 @@ class RecipeSerializer(serializers.ModelSerializer):
             'image', 'text', 'cooking_time'
         )
 
-    def validate(self, data):
-        ingredients = []
-        for ingredient in data:
-            if 'ingredient' not in ingredient or 'amount' not in ingredient:
-                raise serializers.ValidationError(
-                    'Количество ингридиенитов должно быть больше 0')
-            if ingredient['ingredient'] in ingredients:
-                raise serializers.ValidationError(
-                    'Использование повторяющихся ингредиентов не допускается')
-            ingredients.append(ingredient['ingredient'])
-            return data
+    def validate_ingredients(self, ingredients):
+        '''Проверяет ингредиенты и загружает их одним запросом.'''
+        if not ingredients:
+            raise serializers.ValidationError(
+                'Нужно указать хотя бы один ингредиент')
+        ids = [item['ingredient_id'] for item in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Использование повторяющихся ингредиентов не допускается')
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}')
+        return [{'ingredient': found[item['ingredient_id']],
+                 'amount': item['amount']}
+                for item in ingredients]
 
     @transaction.atomic()
     def create(self, validated_data):
@@ -191,26 +265,95 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient in ingredients
         ]
         IngredientRecipe.objects.bulk_create(ingredient_objs)
+        if recipe.image:
+            schedule_image_variants(recipe.id)
+        recipe._written_relations = {
+            'tags': sorted(set(tags), key=lambda tag: tag.id),
+            'ingredientrecipe_set': ingredient_objs}
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        '''Меняет только добавленные, изменённые и удалённые строки.
+
+        Возвращает итоговые строки рецепта в порядке id.
+        '''
+        current, stale, kept = {}, [], []
+        for row in IngredientRecipe.objects.filter(recipe=recipe):
+            if row.ingredient_id in current:
+                stale.append(row.pk)
+            else:
+                current[row.ingredient_id] = row
+        created, changed, deltas = [], [], Counter()
+        for item in ingredients:
+            ingredient, amount = item['ingredient'], item['amount']
+            row = current.pop(ingredient.id, None)
+            if row is None:
+                created.append(IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount))
+                deltas[ingredient.id] += amount
+            else:
+                row.ingredient = ingredient
+                kept.append(row)
+                if row.amount != amount:
+                    deltas[ingredient.id] += amount - row.amount
+                    row.amount = amount
+                    changed.append(row)
+        IngredientRecipe.objects.bulk_create(created)
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        if created or changed:
+            # Массовые операции не отправляют сигналов.
+            ChangeVersion.objects.bump(ChangeVersion.RECIPES)
+            reindex_recipes([recipe.id])
+        # Удаление отправляет post_delete, корзины пересчитает сигнал.
+        stale += [row.pk for row in current.values()]
+        if stale:
+            IngredientRecipe.objects.filter(pk__in=stale).delete()
+        recipe_ingredients_changed(recipe.id, deltas)
+        return sorted(kept, key=lambda row: row.pk) + created
+
+    def image_changed(self, instance, validated_data):
+        '''Передана новая картинка или удалена существующая.'''
+        if 'image' not in validated_data:
+            return False
+        return validated_data['image'] is not None or bool(instance.image)
+
     @transaction.atomic()
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
+        relations = {
+            name: list(objects) for name, objects in getattr(
+                instance, '_prefetched_objects_cache', {}).items()
+        }
         if tags is not None:
             instance.tags.set(tags)
+            relations['tags'] = sorted(set(tags), key=lambda tag: tag.id)
         if ingredients is not None:
-            instance.ingredients.clear()
-            ingredient_objs = [
-                IngredientRecipe(
-                    recipe=instance,
-                    ingredient=ingredient['ingredient'],
-                    amount=ingredient['amount']
-                )
-                for ingredient in ingredients
-            ]
-            IngredientRecipe.objects.bulk_create(ingredient_objs)
-        return super().update(instance, validated_data)
+            relations['ingredientrecipe_set'] = self.update_ingredients(
+                instance, ingredients)
+        # Сохраняются только переданные поля: счётчики и другие
+        # денормализованные столбцы экземпляра могли устареть.
+        fields = list(validated_data)
+        if self.image_changed(instance, validated_data):
+            # Копии могли появиться уже после загрузки экземпляра.
+            stale = Recipe.objects.filter(pk=instance.id).values_list(
+                'image_variants', flat=True).first() or {}
+            schedule_image_variants(instance.id, stale.values())
+            instance.image_variants = {}
+            fields.append('image_variants')
+        instance._written_relations = relations
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if fields:
+            instance.save(update_fields=fields)
+        return instance
 
     def to_representation(self, obj):
+        '''Ответ строится из объектов, уже загруженных при записи.'''
+        cache = obj.__dict__.setdefault('_prefetched_objects_cache', {})
+        for name, objects in getattr(obj, '_written_relations', {}).items():
+            queryset = getattr(obj, name).all()
+            queryset._result_cache = objects
+            queryset._prefetch_done = True
+            cache[name] = queryset
         return RecipeListSerializer(obj, context=self.context).data
@@ -12,6 +12,8 @@ router.register(r'recipes', views.RecipeViewSet, basename='recipes')
 
 
 urlpatterns = [
+    path('users/feed/', views.FeedViewSet.as_view({'get': 'list'}),
+         name='feed'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
@@ -1,24 +1,71 @@
-from recipes.models import ShoppingList
-
-
-def create_shopping_list_file(user):
-    shopping_list = ShoppingList.objects.filter(user=user)
-    ingredients = {}
-    for item in shopping_list:
-        for ingredient in item.recipe.ingredients.all():
-            if hasattr(ingredient, 'amount'):
-                if ingredient.name in ingredients:
-                    ingredients[ingredient.name] += ingredient.amount
-                else:
-                    ingredients[ingredient.name] = ingredient.amount
-            else:
-                if hasattr(ingredient, 'ingredien'):
-                    if ingredient.name in ingredients:
-                        ingredients[ingredient.name] += ingredient.ingredien
-                    else:
-                        ingredients[ingredient.name] = ingredient.ingredien
-
-    output = ''
-    for name, amount in ingredients.items():
-        output += f'{name} - {amount} {name.measurement_unit}\n'
-    return output
+from django.db.models import F, Sum
+
+from recipes.models import CartIngredient
+from recipes.units import canonical_unit, to_display_unit, unit_factor
+from users.models import Subscriber
+
+# Наибольшее значение BigAutoField.
+MAX_ID = 2 ** 63 - 1
+
+
+def get_shopping_list_ingredients(user):
+    '''Итоги корзины в базовых единицах измерения.
+
+    Количества из таблицы итогов переводятся в базовые единицы
+    и суммируются по названию ингредиента в одном запросе.
+    '''
+    return (
+        CartIngredient.objects
+        .filter(user=user)
+        .annotate(name=F('ingredient__name'),
+                  unit=canonical_unit('ingredient__measurement_unit'))
+        .values('name', 'unit')
+        .annotate(amount=Sum(
+            F('amount') * unit_factor('ingredient__measurement_unit')))
+        .order_by('name', 'unit')
+    )
+
+
+def iter_shopping_list(user, chunk_size=500):
+    '''Строки списка покупок (название, количество, единица).'''
+    for item in get_shopping_list_ingredients(user).iterator(
+            chunk_size=chunk_size):
+        yield (item['name'],
+               *to_display_unit(item['amount'], item['unit']))
+
+
+def get_requested_fields(request, fields):
+    '''Поля из fields, отобранные параметрами ?fields= и ?omit=.'''
+    params = getattr(request, 'query_params', None) or {}
+    only = params.get('fields')
+    omit = params.get('omit')
+    if only:
+        only = set(only.split(','))
+        fields = [field for field in fields if field in only]
+    if omit:
+        omit = set(omit.split(','))
+        fields = [field for field in fields if field not in omit]
+    return fields
+
+
+def get_recipes_limit(request, default=3):
+    '''Число рецептов автора в ответе из параметра ?recipes_limit=.'''
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return default
+    return max(limit, 0)
+
+
+def get_subscribed_authors(request):
+    '''id авторов, на которых подписан пользователь, читаются
+    раз за запрос.'''
+    authors = getattr(request, '_subscribed_authors', None)
+    if authors is None:
+        user = request.user
+        authors = set() if user.is_anonymous else set(
+            Subscriber.objects.filter(user=user)
+            .values_list('author_id', flat=True)
+        )
+        request._subscribed_authors = authors
+    return authors
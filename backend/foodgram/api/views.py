@@ -1,31 +1,57 @@
-from django.db.models import Exists, OuterRef
-from django.http import FileResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from djoser.views import UserViewSet
 from rest_framework import filters, status, viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.utils import create_shopping_list_file
-from .filters import RecipeFilter, IngredientFilter
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+from api.caching import (cache_anonymous_response, conditional_response,
+                         get_versions)
+from api.exporters import shopping_list_response
+from api.utils import MAX_ID, get_recipes_limit, get_requested_fields
+from recipes.models import (ChangeVersion, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingList, Tag)
+from recipes.search import ingredient_index
+from recipes.services import (add_link, cart_recipes_added,
+                              cart_recipes_removed, favorites_added,
+                              favorites_removed, get_author_recipes,
+                              link_many, remove_link, subscriptions_added)
 from users.models import Subscriber, User
 
+from .filters import IngredientFilter, RecipeFilter, RecipeSearchFilter
+from .pagination import (RecipeCursorPagination, RecipePagination,
+                         UserPagination)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeListSerializer, RecipeSerializer,
-                          ShoppingListSerializer, SubscribeSerializer,
-                          TagSerializer, UserSerializer)
+from .readers import RecipeReader
+from .renderers import SHOPPING_LIST_RENDERERS
+from .serializers import (BulkIdsSerializer, FavoriteSerializer,
+                          IngredientSerializer, RecipeListSerializer,
+                          RecipeSerializer, ShoppingListSerializer,
+                          SubscribeSerializer, TagSerializer, UserSerializer)
+
+
+def get_bulk_ids(request):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def bulk_response(statuses):
+    '''Ответ массовой операции: статус по каждому id.'''
+    return Response([{'id': pk, 'status': value}
+                     for pk, value in statuses.items()])
 
 
 class UsersViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = UserPagination
 
     @action(
         detail=True,
@@ -54,6 +80,25 @@ class UsersViewSet(UserViewSet):
         subscriber.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='subscribe',
+        permission_classes=[IsAuthenticated],
+    )
+    @transaction.atomic()
+    def bulk_subscribe(self, request):
+        user = request.user
+        statuses, created = link_many(
+            user, Subscriber, 'author', get_bulk_ids(request),
+            User.objects.exclude(pk=user.pk)
+        )
+        if created:
+            subscriptions_added(user.id, created)
+        if user.id in statuses:
+            statuses[user.id] = 'self'
+        return bulk_response(statuses)
+
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
         author = get_object_or_404(User, id=id)
@@ -74,11 +119,11 @@ class UsersViewSet(UserViewSet):
     def subscriptions(self, request):
         queryset = User.objects.filter(following__user=self.request.user)
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(
-            pages,
-            context={'request': request},
-            many=True,
-        )
+        context = {'request': request}
+        if get_requested_fields(request, ['recipes']):
+            context['author_recipes'] = get_author_recipes(
+                [author.id for author in pages], get_recipes_limit(request))
+        serializer = SubscribeSerializer(pages, context=context, many=True)
         return self.get_paginated_response(serializer.data)
 
 
@@ -88,6 +133,14 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
+    @conditional_response(ChangeVersion.TAGS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(ChangeVersion.TAGS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -98,43 +151,60 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('name',)
 
+    @conditional_response(ChangeVersion.INGREDIENTS)
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        version, _ = get_versions(
+            request, [ChangeVersion.INGREDIENTS])[ChangeVersion.INGREDIENTS]
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENT_SEARCH_LIMIT, version))
+
+    @conditional_response(ChangeVersion.INGREDIENTS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, filters.OrderingFilter,
+                       RecipeSearchFilter)
     filterset_class = RecipeFilter
     filterset_fields = ('tags', 'author',
                         'is_favorited', 'is_in_shopping_cart',)
-    search_fields = ('$name', )
-    paginator_class = LimitOffsetPagination
+    ordering_fields = ('id', 'favorites_count', 'in_carts_count')
+    ordering = ('-id',)
+    pagination_class = RecipePagination
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    def get_queryset(self):
-        user = self.request.user
+    def get_requested_fields(self):
+        '''Поля ответа на GET-запрос с учётом ?fields= и ?omit=.'''
+        fields = RecipeListSerializer.Meta.fields
+        if self.request.method != 'GET':
+            return set(fields)
+        return set(get_requested_fields(self.request, fields))
 
-        if user.is_anonymous:
-            return Recipe.objects.only(
-                'author').select_related(
-                    'author').prefetch_related('ingredients', 'tags')
-
-        queryset = (
-            Recipe.objects
-            .select_related('author')
-            .prefetch_related('ingredients', 'tags')
-            .annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=user, recipe_id=OuterRef('id'))
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingList.objects.filter(
-                        user=user, recipe_id=OuterRef('id'))
+    def get_queryset(self):
+        fields = self.get_requested_fields()
+        queryset = Recipe.objects.all()
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'ingredientrecipe_set',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient').order_by('id')
                 )
             )
-        )
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
         return queryset
 
     def get_serializer_class(self):
@@ -142,62 +212,153 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeListSerializer
         return RecipeSerializer
 
-    def create_favorite(self, user, recipe):
-        favorite, created = Favorite.objects.get_or_create(
-            user=user,
-            recipe=recipe)
-        return favorite if created else None
+    def get_user_recipes(self, model, field, recipe_ids):
+        '''Рецепты страницы, которые пользователь добавил в model.'''
+        user = self.request.user
+        if user.is_anonymous or field not in self.get_requested_fields():
+            return set()
+        return set(
+            model.objects
+            .filter(user=user, recipe_id__in=recipe_ids)
+            .values_list('recipe_id', flat=True)
+        )
 
-    def create_shopping_list(self, user, recipe):
-        shopping_cart, created = ShoppingList.objects.get_or_create(
-            user=user,
-            recipe=recipe)
-        return shopping_cart if created else None
+    def get_reader(self, rows):
+        context = self.get_serializer_context()
+        recipe_ids = [row['id'] for row in rows]
+        context['favorited_recipes'] = self.get_user_recipes(
+            Favorite, 'is_favorited', recipe_ids)
+        context['carted_recipes'] = self.get_user_recipes(
+            ShoppingList, 'is_in_shopping_cart', recipe_ids)
+        return RecipeReader(self.get_requested_fields(), context)
+
+    @conditional_response(ChangeVersion.RECIPES, ChangeVersion.TAGS,
+                          per_user=True)
+    @cache_anonymous_response(ChangeVersion.RECIPES)
+    def list(self, request, *args, **kwargs):
+        reader = RecipeReader(self.get_requested_fields(), {})
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        rows = page if page is not None else list(rows)
+        data = self.get_reader(rows).serialize(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @conditional_response(ChangeVersion.RECIPES, ChangeVersion.TAGS,
+                          per_user=True)
+    @cache_anonymous_response(ChangeVersion.RECIPES)
+    def retrieve(self, request, *args, **kwargs):
+        reader = RecipeReader(self.get_requested_fields(), {})
+        row = get_object_or_404(
+            reader.values(self.filter_queryset(self.get_queryset())),
+            pk=self.kwargs['pk']
+        )
+        self.check_object_permissions(request, row)
+        return Response(self.get_reader([row]).serialize_one(row))
+
+    def get_recipe_id(self):
+        pk = self.kwargs['pk']
+        if not pk.isdigit() or int(pk) > MAX_ID:
+            raise Http404
+        return int(pk)
+
+    def add_one(self, request, model, added):
+        '''Добавляет рецепт в список одним INSERT.
+
+        Рецепт заранее не читается: если его нет, вставка не пройдёт
+        проверку внешнего ключа. Возвращает строку связи или None,
+        если рецепт уже был в списке.
+        '''
+        recipe_id = self.get_recipe_id()
+        try:
+            with transaction.atomic():
+                link_id = add_link(model, 'recipe', request.user.id,
+                                   recipe_id)
+                if link_id is not None:
+                    added(request.user.id, [recipe_id])
+        except IntegrityError:
+            raise Http404
+        if link_id is None:
+            return None
+        return model(id=link_id, user=request.user, recipe_id=recipe_id)
+
+    def remove_one(self, request, model, removed):
+        recipe_id = self.get_recipe_id()
+        with transaction.atomic():
+            deleted = remove_link(model, 'recipe', request.user.id,
+                                  recipe_id)
+            if deleted:
+                removed(request.user.id, [recipe_id])
+        if deleted:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs.get('pk'))
-        favorite = self.create_favorite(request.user, recipe)
+        favorite = self.add_one(request, Favorite, favorites_added)
         serializer = FavoriteSerializer(favorite)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
-        favorites = Favorite.objects.filter(user=request.user, recipe=recipe)
-        if favorites.exists():
-            favorites.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        return self.remove_one(request, Favorite, favorites_removed)
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs.get('pk'))
-        if request.method == 'POST':
-            shopping_cart = self.create_shopping_list(request.user, recipe)
-            if shopping_cart:
-                serializer = ShoppingListSerializer(shopping_cart)
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        shopping_cart = self.add_one(request, ShoppingList,
+                                     cart_recipes_added)
+        if shopping_cart:
+            serializer = ShoppingListSerializer(shopping_cart)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, **kwargs):
-        recipe = get_object_or_404(Recipe, id=kwargs.get('pk'))
-        shopping_carts = ShoppingList.objects.filter(user=request.user,
-                                                     recipe=recipe)
-        if shopping_carts.exists():
-            shopping_carts.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        return self.remove_one(request, ShoppingList, cart_recipes_removed)
 
-    @action(detail=False, methods=['get'],
+    def add_many(self, request, model, added):
+        user = request.user
+        statuses, created = link_many(
+            user, model, 'recipe', get_bulk_ids(request),
+            Recipe.objects.all()
+        )
+        if created:
+            added(user.id, created)
+        return bulk_response(statuses)
+
+    @action(detail=False, methods=['post'], url_path='favorite',
             permission_classes=[IsAuthenticated])
+    @transaction.atomic()
+    def bulk_favorite(self, request):
+        return self.add_many(request, Favorite, favorites_added)
+
+    @action(detail=False, methods=['post'], url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    @transaction.atomic()
+    def bulk_shopping_cart(self, request):
+        return self.add_many(request, ShoppingList, cart_recipes_added)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
-        user = request.user
-        output = create_shopping_list_file(user)
-        response = FileResponse(output, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment;filename="{file}.txt"')
-        return response
+        return shopping_list_response(request.user,
+                                      request.accepted_renderer.format)
+
+
+class FeedViewSet(RecipeViewSet):
+    '''Лента рецептов авторов, на которых подписан пользователь.
+
+    Рецепты берутся из заранее разложенных по лентам записей FeedItem
+    и отдаются курсорными страницами по убыванию id.
+    '''
+    permission_classes = (IsAuthenticated,)
+    filter_backends = ()
+    pagination_class = RecipeCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            feed_items__user=self.request.user)
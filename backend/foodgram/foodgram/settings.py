@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
@@ -77,6 +78,22 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 600)),
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,6 +129,21 @@ MEDIA_ROOT = '/media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 5 * 2 ** 20))
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 30))
+
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', 600))
+
 
 REST_FRAMEWORK = {
 
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at',
+                    'wait_time', 'run_time', 'worker')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedup_key')
+    readonly_fields = ('created_at', 'started_at', 'finished_at',
+                       'wait_time', 'run_time', 'worker', 'last_error')
@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.models import Job
+from jobs.services import HANDLERS
+
+
+class Command(BaseCommand):
+    help = 'Adds a background job to the queue, e.g. from cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Registered job handler name')
+        parser.add_argument(
+            '--payload', type=json.loads, default={},
+            help='Handler keyword arguments as a JSON object'
+        )
+        parser.add_argument(
+            '--dedup-key',
+            help='Skip the job if one with this key is already queued'
+        )
+
+    def handle(self, *args, **options):
+        if options['name'] not in HANDLERS:
+            raise CommandError(
+                f'Unknown job handler {options["name"]}, available: '
+                f'{", ".join(sorted(HANDLERS))}')
+        Job.objects.enqueue(options['name'], options['payload'],
+                            dedup_key=options['dedup_key'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Job {options["name"]} queued'))
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.services import work
+
+
+class Command(BaseCommand):
+    help = 'Runs background job workers in threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOB_WORKERS,
+            help='Number of workers'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run workers in separate processes instead of threads'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait before polling an empty queue again'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            stop = multiprocessing.Event()
+            spawn = multiprocessing.Process
+        else:
+            stop = threading.Event()
+            spawn = threading.Thread
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+        # Исполнители открывают свои соединения, а дочерним процессам
+        # нельзя наследовать соединения родителя.
+        connections.close_all()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        workers = [
+            spawn(target=work,
+                  args=(f'{prefix}:{number}', stop, options['poll_interval'],
+                        options['burst']))
+            for number in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f'Started {len(workers)} workers, press Ctrl+C to stop')
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
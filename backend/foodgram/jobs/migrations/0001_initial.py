@@ -0,0 +1,48 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Обработчик')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Аргументы')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Состояние')),
+                ('dedup_key', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ключ дедупликации')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='Наибольшее число попыток')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить не раньше')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало последней попытки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('wait_time', models.FloatField(blank=True, null=True, verbose_name='Ожидание в очереди, с')),
+                ('run_time', models.FloatField(blank=True, null=True, verbose_name='Время выполнения, с')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Исполнитель')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'queued')), fields=['run_at', 'id'], name='job_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('dedup_key',), name='unique_queued_job'),
+        ),
+    ]
@@ -0,0 +1,120 @@
+from django.db import models
+from django.utils import timezone
+
+
+class JobManager(models.Manager):
+    def enqueue(self, name, payload=None, dedup_key=None, run_at=None,
+                max_attempts=3):
+        '''Ставит задачу в очередь в текущей транзакции.
+
+        Если задача с тем же dedup_key уже ждёт в очереди, новая
+        не добавляется: ждущая задача ещё выполнит ту же работу.
+        '''
+        self.bulk_create([self.model(
+            name=name,
+            payload=payload or {},
+            dedup_key=dedup_key,
+            run_at=run_at or timezone.now(),
+            max_attempts=max_attempts
+        )], ignore_conflicts=True)
+
+
+class Job(models.Model):
+    '''Фоновая задача в очереди на базе данных'''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Обработчик'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Аргументы'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Состояние'
+    )
+    dedup_key = models.CharField(
+        max_length=200,
+        null=True,
+        blank=True,
+        verbose_name='Ключ дедупликации'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        verbose_name='Наибольшее число попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить не раньше'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана'
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начало последней попытки'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена'
+    )
+    wait_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Ожидание в очереди, с'
+    )
+    run_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Время выполнения, с'
+    )
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Исполнитель'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    objects = JobManager()
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-id',)
+        indexes = [
+            models.Index(fields=['run_at', 'id'],
+                         condition=models.Q(status='queued'),
+                         name='job_queue_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'],
+                                    condition=models.Q(status='queued'),
+                                    name='unique_queued_job')
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}: {self.status}'
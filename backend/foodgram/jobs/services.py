@@ -0,0 +1,144 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (DatabaseError, IntegrityError, close_old_connections,
+                       transaction)
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register(name):
+    '''Декоратор: регистрирует обработчик задач с именем name.
+
+    Обработчик получает payload задачи как именованные аргументы
+    и сам управляет транзакциями.
+    '''
+    def decorator(handler):
+        HANDLERS[name] = handler
+        return handler
+    return decorator
+
+
+def claim_job(worker):
+    '''Забирает первую готовую задачу, None если очередь пуста.
+
+    Строки, уже заблокированные другими исполнителями, пропускаются
+    (SKIP LOCKED). Смена состояния проверяется условием, поэтому задачу
+    не заберут дважды и на базах без блокировок строк.
+    '''
+    while True:
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status=Job.QUEUED, run_at__lte=timezone.now())
+                .order_by('run_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.started_at = timezone.now()
+            job.worker = worker
+            claimed = Job.objects.filter(
+                pk=job.pk, status=Job.QUEUED).update(
+                    status=job.status, attempts=job.attempts,
+                    started_at=job.started_at, worker=worker)
+        if claimed:
+            return job
+
+
+def requeue(job, error):
+    '''Возвращает задачу в очередь с экспоненциальной задержкой
+    или помечает её как проваленную, если попытки кончились.'''
+    job.last_error = error
+    if job.attempts >= job.max_attempts:
+        job.status = Job.FAILED
+    else:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(
+            seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # В очереди уже есть задача с тем же ключом, она и выполнит работу.
+        job.status = Job.FAILED
+        job.save()
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.name)
+    started = time.monotonic()
+    job.wait_time = (job.started_at - job.run_at).total_seconds()
+    try:
+        if handler is None:
+            raise LookupError(f'Unknown job handler: {job.name}')
+        handler(**job.payload)
+    except Exception:
+        job.run_time = time.monotonic() - started
+        job.finished_at = timezone.now()
+        logger.exception('Job %s failed', job)
+        requeue(job, traceback.format_exc())
+    else:
+        job.run_time = time.monotonic() - started
+        job.finished_at = timezone.now()
+        job.status = Job.DONE
+        job.last_error = ''
+        job.save()
+        logger.info('Job %s done in %.3fs after %.3fs in queue',
+                    job, job.run_time, job.wait_time)
+    return job
+
+
+def requeue_stale_jobs():
+    '''Задачи, зависшие дольше JOB_TIMEOUT (исполнитель упал),
+    возвращаются в очередь.'''
+    deadline = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    # Проверку выполняют все исполнители: заблокированные другим
+    # исполнителем задачи пропускаются.
+    with transaction.atomic():
+        stale = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.RUNNING, started_at__lt=deadline)
+        for job in stale:
+            requeue(job, 'Timed out')
+
+
+def work(worker, stop, poll_interval=1.0, burst=False):
+    '''Цикл исполнителя: выполняет задачи, пока не выставлен stop.
+
+    Раз в половину JOB_TIMEOUT исполнитель возвращает в очередь задачи
+    упавших исполнителей. В режиме burst он завершается, когда очередь
+    пуста.
+    '''
+    next_stale_check = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if time.monotonic() >= next_stale_check:
+                    requeue_stale_jobs()
+                    next_stale_check = (time.monotonic()
+                                        + settings.JOB_TIMEOUT / 2)
+                job = claim_job(worker)
+            except DatabaseError:
+                logger.exception('Worker %s failed to poll the queue',
+                                 worker)
+                stop.wait(poll_interval)
+                continue
+            if job is not None:
+                run_job(job)
+            elif burst:
+                return
+            else:
+                stop.wait(poll_interval)
+    finally:
+        close_old_connections()
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingList, Tag)
+from .models import (CartIngredient, Favorite, Ingredient, IngredientRecipe,
+                     Recipe, ShoppingList, Tag)
 
 
 @admin.register(Tag)
@@ -17,7 +17,8 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'name', 'cooking_time')
+    list_display = ('id', 'author', 'name', 'cooking_time',
+                    'favorites_count')
     list_filter = ('author', 'tags')
     search_fields = ('name', 'author__username')
     empty_value_display = '-пусто-'
@@ -38,3 +39,9 @@ class FavoriteAdmin(admin.ModelAdmin):
 class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
+
+
+@admin.register(CartIngredient)
+class CartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    search_fields = ('user__username', 'ingredient__name')
@@ -0,0 +1,97 @@
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from jobs.models import Job
+
+from .models import ChangeVersion, Recipe
+
+# Имя варианта: (наибольшие ширина и высота, формат Pillow).
+VARIANTS = {
+    'thumbnail': ((320, 320), 'JPEG'),
+    'thumbnail_webp': ((320, 320), 'WEBP'),
+    'webp': ((1280, 1280), 'WEBP'),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+VARIANTS_DIR = 'recipes/variants'
+
+
+def get_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def variant_urls(variants, request=None):
+    '''Адреса уменьшенных копий по именам вариантов.'''
+    storage = get_storage()
+    urls = {name: storage.url(path) for name, path in variants.items()}
+    if request is not None:
+        urls = {name: request.build_absolute_uri(url)
+                for name, url in urls.items()}
+    return urls
+
+
+def render_variant(image, size, format):
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if format == 'JPEG' and copy.mode != 'RGB':
+        copy = copy.convert('RGB')
+    output = BytesIO()
+    copy.save(output, format, quality=80)
+    return ContentFile(output.getvalue())
+
+
+def build_variants(image_name):
+    '''Сохраняет уменьшенные копии картинки, возвращает их пути.'''
+    storage = get_storage()
+    stem = PurePosixPath(image_name).stem
+    with storage.open(image_name, 'rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+        return {
+            name: storage.save(
+                f'{VARIANTS_DIR}/{stem}_{name}.{EXTENSIONS[format]}',
+                render_variant(image, size, format))
+            for name, (size, format) in VARIANTS.items()
+        }
+
+
+def delete_files(paths):
+    storage = get_storage()
+    for path in paths:
+        storage.delete(path)
+
+
+def process_recipe_image(recipe_id, stale=()):
+    '''Готовит копии текущей картинки рецепта и удаляет устаревшие.
+
+    Если картинку успели заменить, готовые копии удаляются: ими
+    займётся задача, поставленная при замене.
+    '''
+    image_name = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', flat=True).first()
+    if image_name:
+        variants = build_variants(image_name)
+        with transaction.atomic():
+            updated = Recipe.objects.filter(
+                pk=recipe_id, image=image_name).update(
+                    image_variants=variants)
+            if updated:
+                ChangeVersion.objects.bump(ChangeVersion.RECIPES)
+        if not updated:
+            delete_files(variants.values())
+    delete_files(stale)
+
+
+def schedule_image_variants(recipe_id, stale=()):
+    '''Ставит обработку картинки рецепта в очередь фоновых задач,
+    чтобы запрос не ждал пересжатия.'''
+    Job.objects.enqueue(
+        'recipes.process_image',
+        {'recipe_id': recipe_id, 'stale': list(stale)},
+        dedup_key=f'recipes.process_image:{recipe_id}'
+    )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Builds thumbnail and WebP copies of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Rebuild copies for every recipe, not only missing ones'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        done = failed = 0
+        for recipe_id, variants in recipes.values_list(
+                'id', 'image_variants').order_by('id').iterator():
+            try:
+                process_recipe_image(recipe_id, variants.values())
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Recipe {recipe_id}: {error}'))
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Image copies built: {done}, failed: {failed}'))
@@ -1,25 +1,181 @@
+import csv
 import json
+from pathlib import Path
 
 from django.core.management.base import BaseCommand
 
-from recipes.models import Ingredient
+from recipes.models import ChangeVersion, Ingredient
+
+DEFAULT_PATH = 'recipes/data/ingredients.json'
+# Символы, которыми может продолжаться число JSON.
+NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+
+def read_csv(file):
+    '''Строки (название, единица измерения) из CSV без заголовка.'''
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ''
+
+
+class JSONArrayReader:
+    '''Потоковое чтение JSON-массива верхнего уровня.
+
+    Файл читается кусками по chunk_size символов, элементы
+    разбираются JSONDecoder.raw_decode по одному, в памяти держится
+    только ещё не разобранный остаток.
+    '''
+
+    def __init__(self, file, chunk_size=64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read_more(self):
+        chunk = self.file.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def next_char(self):
+        '''Следующий значащий символ, None в конце файла.'''
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position].isspace()):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                return None
+            self.read_more()
+
+    def expect(self, chars):
+        char = self.next_char()
+        if char is None or char not in chars:
+            raise json.JSONDecodeError(
+                f'Expecting one of {chars!r}', self.buffer, self.position)
+        self.position += 1
+        return char
+
+    def read_value(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # Число на границе куска может быть обрезано: 1.5e|3.
+                if self.eof or (end < len(self.buffer)
+                                and self.buffer[end] not in NUMBER_CHARS):
+                    self.position = end
+                    return value
+            self.read_more()
+
+    def __iter__(self):
+        self.expect('[')
+        if self.next_char() == ']':
+            self.position += 1
+            return
+        while True:
+            self.next_char()
+            yield self.read_value()
+            if self.expect(',]') == ']':
+                return
+
+
+def read_json(file):
+    '''Строки (название, единица измерения) из JSON-массива объектов.'''
+    for item in JSONArrayReader(file):
+        yield item.get('name', ''), item.get('measurement_unit', '')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
 
 
 class Command(BaseCommand):
-    help = 'Loads data from ingredient.json'
+    help = ('Loads ingredients from a CSV or JSON file, skipping ones '
+            'that already exist')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=DEFAULT_PATH,
+            help=f'Path to the file, {DEFAULT_PATH} by default'
+        )
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='File format, taken from the file extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per query'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be loaded without writing anything'
+        )
 
     def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(options['format'] or path.suffix.lstrip('.'))
+        if reader is None:
+            self.stdout.write(self.style.ERROR('Unknown file format!'))
+            return
         try:
-            with open('recipes/data/ingredients.json', 'r') as f:
-                data = json.load(f)
-                ingredients = ([Ingredient(name=d['name'],
-                                measurement_unit=d['measurement_unit'])
-                                for d in data])
-                Ingredient.objects.bulk_create(ingredients)
-                self.stdout.write(self.style.SUCCESS(
-                    'Ingredients loaded successfully!')
-                )
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                read, created, skipped = self.load(
+                    reader(file), options['batch_size'], options['dry_run'])
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR('File not found!'))
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR('Error decoding JSON file!'))
+            return
+        except (json.JSONDecodeError, csv.Error):
+            self.stdout.write(self.style.ERROR('Error decoding file!'))
+            return
+        if created and not options['dry_run']:
+            ChangeVersion.objects.bump(ChangeVersion.RECIPES,
+                                       ChangeVersion.INGREDIENTS)
+        prefix = ('Dry run' if options['dry_run']
+                  else 'Ingredients loaded successfully!')
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} Read: {read}, new: {created}, '
+            f'already present: {read - created - skipped}, '
+            f'skipped: {skipped}'))
+
+    def load(self, rows, batch_size, dry_run):
+        max_length = Ingredient._meta.get_field('name').max_length
+        read, created, skipped, batch = 0, 0, 0, []
+        for name, measurement_unit in rows:
+            read += 1
+            name, measurement_unit = name.strip(), measurement_unit.strip()
+            if (not name or not measurement_unit
+                    or max(len(name), len(measurement_unit)) > max_length):
+                skipped += 1
+                continue
+            batch.append((name, measurement_unit))
+            if len(batch) >= batch_size:
+                created += self.import_batch(batch, dry_run)
+                batch = []
+                self.stdout.write(f'Read {read} rows, new {created}')
+        if batch:
+            created += self.import_batch(batch, dry_run)
+        return read, created, skipped
+
+    def import_batch(self, batch, dry_run):
+        '''Добавляет ингредиенты пачки, которых ещё нет в базе.'''
+        existing = set(
+            Ingredient.objects
+            .filter(name__in={name for name, _ in batch})
+            .values_list('name', 'measurement_unit')
+        )
+        new = [pair for pair in dict.fromkeys(batch) if pair not in existing]
+        if not dry_run:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in new],
+                ignore_conflicts=True
+            )
+        return len(new)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FeedItem
+from recipes.services import fill_feeds
+from users.models import Subscriber, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds subscription feeds from subscriptions and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of users whose feeds are rebuilt per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users, items, last_pk = 0, 0, 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    User.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1]
+                FeedItem.objects.filter(user_id__in=batch).delete()
+                items += fill_feeds(
+                    Subscriber.objects
+                    .filter(user_id__in=batch, author__autor__isnull=False)
+                    .values_list('user_id', 'author__autor', 'author_id')
+                    .iterator()
+                )
+                users += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Feeds rebuilt: {users} users, {items} items'))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from recipes.models import Favorite, Recipe, ShoppingList
+from recipes.services import count_of
+from users.models import User
+
+COUNTERS = (
+    (Recipe, {'favorites_count': (Favorite, 'recipe'),
+              'in_carts_count': (ShoppingList, 'recipe')}),
+    (User, {'recipes_count': (Recipe, 'author')}),
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalculates denormalized counters and repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows checked per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, counters in COUNTERS:
+            fixed = self.reconcile(model, counters, batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: fixed {fixed} rows'))
+
+    def reconcile(self, model, counters, batch_size):
+        '''Проходит таблицу пачками по первичному ключу.'''
+        actual = {f'actual_{field}': count_of(*source)
+                  for field, source in counters.items()}
+        drift = Q()
+        for field in counters:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        fixed, last_pk = 0, 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    model.objects.select_for_update()
+                    .filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not batch:
+                    return fixed
+                last_pk = batch[-1]
+                rows = list(
+                    model.objects.filter(pk__in=batch)
+                    .annotate(**actual).filter(drift)
+                    .only('pk', *counters)
+                )
+                for row in rows:
+                    for field in counters:
+                        setattr(row, field, getattr(row, f'actual_{field}'))
+                model.objects.bulk_update(rows, list(counters))
+                fixed += len(rows)
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:52
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_cart_ingredients(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    CartIngredient = apps.get_model('recipes', 'CartIngredient')
+    totals = (
+        IngredientRecipe.objects
+        .filter(recipe__cart__isnull=False)
+        .values('recipe__cart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    CartIngredient.objects.bulk_create(
+        (CartIngredient(user_id=row['recipe__cart__user_id'],
+                        ingredient_id=row['ingredient_id'],
+                        amount=row['total'])
+         for row in totals.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_delete_subscribed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в корзине',
+                'verbose_name_plural': 'Ингредиенты в корзине',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_ingredient'),
+        ),
+        migrations.RunPython(fill_cart_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_versions(apps, schema_editor):
+    ChangeVersion = apps.get_model('recipes', 'ChangeVersion')
+    ChangeVersion.objects.get_or_create(name='recipes')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_cartingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Область данных')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия данных',
+                'verbose_name_plural': 'Версии данных',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:02
+
+from django.db import migrations
+
+
+def create_versions(apps, schema_editor):
+    ChangeVersion = apps.get_model('recipes', 'ChangeVersion')
+    for name in ('tags', 'ingredients'):
+        ChangeVersion.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_changeversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
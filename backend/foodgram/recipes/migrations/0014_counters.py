@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite, 'recipe'),
+        in_carts_count=count_of(ShoppingList, 'recipe'),
+    )
+    User.objects.update(recipes_count=count_of(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_recipes_count'),
+        ('recipes', '0013_create_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
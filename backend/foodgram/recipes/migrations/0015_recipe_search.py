@@ -0,0 +1,63 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:03
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+CREATE_INDEX_SQL = '''
+CREATE INDEX recipes_recipesearch_vector_gin
+ON recipes_recipesearch USING gin (vector)
+'''
+
+FILL_VECTORS_SQL = '''
+INSERT INTO recipes_recipesearch (recipe_id, vector)
+SELECT r.id,
+    setweight(to_tsvector('russian', translate(r.name, 'Ёё', 'Ее')), 'A')
+    || setweight(to_tsvector('russian', translate(coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM recipes_recipe_tags rt
+        JOIN recipes_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = r.id), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector('russian', translate(coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_ingredientrecipe ir
+        JOIN recipes_ingredient i ON i.id = ir.ingredient_id
+        WHERE ir.recipe_id = r.id), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector('russian', translate(r.text, 'Ёё', 'Ее')), 'D')
+FROM recipes_recipe r
+'''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_INDEX_SQL)
+    schema_editor.execute(FILL_VECTORS_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS recipes_recipesearch_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='Поисковый вектор')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
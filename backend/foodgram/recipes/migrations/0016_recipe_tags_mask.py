@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:06
+
+from django.db import migrations, models
+from django.db.models import (BigIntegerField, F, OuterRef, Subquery, Sum,
+                              Value)
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_tags_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(tags_mask=Coalesce(
+        Subquery(
+            Recipe.tags.through.objects
+            .filter(recipe=OuterRef('pk'), tag_id__lte=63)
+            .order_by()
+            .values('recipe')
+            .annotate(mask=Sum(
+                Cast(Value(1), BigIntegerField()).bitleftshift(
+                    F('tag_id') - 1),
+                output_field=BigIntegerField()
+            ))
+            .values('mask')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+    ]
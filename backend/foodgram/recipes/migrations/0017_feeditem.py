@@ -0,0 +1,49 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    Subscriber = apps.get_model('users', 'Subscriber')
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    rows = (
+        Subscriber.objects
+        .filter(author__autor__isnull=False)
+        .values_list('user_id', 'author__autor', 'author_id')
+    )
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+         for user_id, recipe_id, author_id in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0016_recipe_tags_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:14
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    '''Оставляет один ингредиент на пару (название, единица).
+
+    Ссылки из рецептов переводятся на оставшийся ингредиент, итоги
+    корзин складываются.
+    '''
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    CartIngredient = apps.get_model('recipes', 'CartIngredient')
+    groups = (
+        Ingredient.objects
+        .values('name', 'measurement_unit')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in list(groups):
+        keep = group['keep']
+        extra = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(pk=keep)
+            .values_list('pk', flat=True)
+        )
+        IngredientRecipe.objects.filter(ingredient_id__in=extra).update(
+            ingredient_id=keep)
+        for cart in list(CartIngredient.objects.filter(
+                ingredient_id__in=extra)):
+            total, _ = CartIngredient.objects.get_or_create(
+                user_id=cart.user_id, ingredient_id=keep,
+                defaults={'amount': 0})
+            total.amount += cart.amount
+            total.save(update_fields=['amount'])
+            cart.delete()
+        Ingredient.objects.filter(pk__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_feeditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 from users.models import User
 
@@ -45,6 +48,10 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'measurement_unit'],
+                                    name='unique_ingredient')
+        ]
 
     def __str__(self):
         return self.name
@@ -77,6 +84,12 @@ class Recipe(models.Model):
         null=True,
         default=None
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки'
+    )
     tags = models.ManyToManyField(
         Tag,
         related_name='Tags',
@@ -86,6 +99,23 @@ class Recipe(models.Model):
         verbose_name='Время приготовления',
         validators=[MinValueValidator(1)]
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Битовая маска тегов'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -166,3 +196,139 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class FeedItem(models.Model):
+    '''Рецепт в ленте подписчика его автора'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique_feed_item')
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.recipe_id}'
+
+
+class CartIngredient(models.Model):
+    '''Суммарное количество ингредиента в корзине пользователя'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_cart_ingredient')
+        ]
+
+    def __str__(self):
+        return (f'{self.user} - {self.ingredient.name} '
+                f'{self.amount} {self.ingredient.measurement_unit}')
+
+
+class ChangeVersionManager(models.Manager):
+    def bump(self, *names):
+        '''Увеличивает счётчики изменений в текущей транзакции.'''
+        for name in names:
+            updated = self.filter(name=name).update(
+                value=F('value') + 1, updated_at=timezone.now())
+            if not updated:
+                self.get_or_create(name=name, defaults={'value': 1})
+
+    def get_value(self, name):
+        return self.filter(name=name).values_list(
+            'value', flat=True).first() or 0
+
+
+class ChangeVersion(models.Model):
+    '''Счётчик изменений данных, по которому сбрасываются кэши'''
+    RECIPES = 'recipes'
+    TAGS = 'tags'
+    INGREDIENTS = 'ingredients'
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Область данных'
+    )
+    value = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Время изменения'
+    )
+
+    objects = ChangeVersionManager()
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @staticmethod
+    def for_user(user_id):
+        '''Область личных данных пользователя: избранное, корзина,
+        подписки.'''
+        return f'user:{user_id}'
+
+
+class RecipeSearch(models.Model):
+    '''Поисковый документ рецепта для полнотекстового поиска PostgreSQL'''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search',
+        verbose_name='Рецепт'
+    )
+    vector = SearchVectorField(
+        null=True,
+        verbose_name='Поисковый вектор'
+    )
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+    def __str__(self):
+        return str(self.recipe_id)
@@ -0,0 +1,204 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice
+
+import snowballstemmer
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Value, When
+
+from .models import ChangeVersion, Ingredient, IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+WORD_RE = re.compile(r'\w+')
+
+# Веса частей документа те же, что у ts_rank по умолчанию для A, B и D.
+WEIGHTS = {'name': 1.0, 'tags': 0.4, 'ingredients': 0.4, 'text': 0.1}
+
+UPDATE_VECTORS_SQL = '''
+INSERT INTO recipes_recipesearch (recipe_id, vector)
+SELECT r.id,
+    setweight(to_tsvector(%(config)s, translate(r.name, 'Ёё', 'Ее')), 'A')
+    || setweight(to_tsvector(%(config)s, translate(coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM recipes_recipe_tags rt
+        JOIN recipes_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = r.id), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector(%(config)s, translate(coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_ingredientrecipe ir
+        JOIN recipes_ingredient i ON i.id = ir.ingredient_id
+        WHERE ir.recipe_id = r.id), ''), 'Ёё', 'Ее')), 'B')
+    || setweight(to_tsvector(%(config)s, translate(r.text, 'Ёё', 'Ее')), 'D')
+FROM recipes_recipe r
+WHERE r.id = ANY(%(ids)s)
+ON CONFLICT (recipe_id) DO UPDATE SET vector = EXCLUDED.vector
+'''
+
+_stemmer = threading.local()
+
+
+def fold(text):
+    '''Нижний регистр и замена «ё» на «е».'''
+    return text.lower().replace('ё', 'е')
+
+
+def get_terms(text):
+    '''Основы слов текста по стеммеру Snowball для русского языка.'''
+    stemmer = getattr(_stemmer, 'russian', None)
+    if stemmer is None:
+        stemmer = _stemmer.russian = snowballstemmer.stemmer('russian')
+    return stemmer.stemWords(WORD_RE.findall(fold(text)))
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids):
+    '''Пересчитывает tsvector рецептов одним запросом.
+
+    Удалённые к этому моменту рецепты просто пропускаются.
+    '''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not uses_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_VECTORS_SQL,
+                       {'config': SEARCH_CONFIG, 'ids': recipe_ids})
+
+
+def reindex_recipes(recipe_ids):
+    '''Обновляет поисковый индекс рецептов после фиксации транзакции.'''
+    if uses_postgres():
+        recipe_ids = set(recipe_ids)
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+class InvertedIndex:
+    '''Обратный индекс рецептов в памяти процесса.
+
+    Используется вместо tsvector на базах без полнотекстового поиска
+    (SQLite в тестах). Индекс собирается заново, когда меняется
+    версия данных рецептов.
+    '''
+
+    def __init__(self):
+        self.version = None
+        self.postings = {}
+        self.lock = threading.Lock()
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+
+        def add(recipe_id, text, weight):
+            for term in get_terms(text):
+                postings[term][recipe_id] += weight
+
+        for recipe_id, name, text in Recipe.objects.values_list(
+                'id', 'name', 'text').order_by().iterator():
+            add(recipe_id, name, WEIGHTS['name'])
+            add(recipe_id, text, WEIGHTS['text'])
+        for recipe_id, name in Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag__name').iterator():
+            add(recipe_id, name, WEIGHTS['tags'])
+        for recipe_id, name in IngredientRecipe.objects.values_list(
+                'recipe_id', 'ingredient__name').iterator():
+            add(recipe_id, name, WEIGHTS['ingredients'])
+        return {term: dict(scores) for term, scores in postings.items()}
+
+    def refresh(self):
+        version = ChangeVersion.objects.get_value(ChangeVersion.RECIPES)
+        with self.lock:
+            if version != self.version:
+                self.postings = self.build()
+                self.version = version
+        return self.postings
+
+    def search(self, query):
+        '''Словарь {id рецепта: релевантность}, все слова запроса
+        должны встретиться в рецепте.'''
+        postings = self.refresh()
+        scores = None
+        for term in set(get_terms(query)):
+            matches = postings.get(term, {})
+            if scores is None:
+                scores = dict(matches)
+            else:
+                scores = {recipe_id: score + matches[recipe_id]
+                          for recipe_id, score in scores.items()
+                          if recipe_id in matches}
+        return scores or {}
+
+
+inverted_index = InvertedIndex()
+
+
+class IngredientIndex:
+    '''Ингредиенты, отсортированные по названию, для автодополнения.
+
+    Загружается при первом поиске и пересобирается, когда меняется
+    версия данных ингредиентов. Если версия уже известна из запроса,
+    поиск обходится без обращения к базе.
+    '''
+
+    def __init__(self):
+        self.version = None
+        self.entries = ([], [])
+        self.lock = threading.Lock()
+
+    def build(self):
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+            .order_by(),
+            key=lambda item: (fold(item['name']), item['id'])
+        )
+        return [fold(item['name']) for item in items], items
+
+    def refresh(self, version=None):
+        if version is None:
+            version = ChangeVersion.objects.get_value(
+                ChangeVersion.INGREDIENTS)
+        with self.lock:
+            if version != self.version:
+                self.entries = self.build()
+                self.version = version
+            return self.entries
+
+    def search(self, query, limit, version=None):
+        '''Сначала ингредиенты, название которых начинается с query,
+        затем те, в названии которых query встречается.'''
+        names, items = self.refresh(version)
+        query = fold(query.strip())
+        start = bisect_left(names, query)
+        end = start
+        while end < len(names) and end - start < limit and (
+                names[end].startswith(query)):
+            end += 1
+        found = items[start:end]
+        if len(found) < limit:
+            found += islice(
+                (item for name, item in zip(names, items)
+                 if query in name and not name.startswith(query)),
+                limit - len(found)
+            )
+        return found
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_recipes(queryset, query):
+    '''Рецепты, найденные по запросу, с релевантностью в search_rank.'''
+    if uses_postgres():
+        search_query = SearchQuery(fold(query), config=SEARCH_CONFIG)
+        return queryset.filter(search__vector=search_query).annotate(
+            search_rank=SearchRank(F('search__vector'), search_query))
+    scores = inverted_index.search(query)
+    return queryset.filter(pk__in=scores).annotate(search_rank=Case(
+        *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField()
+    ))
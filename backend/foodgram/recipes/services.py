@@ -0,0 +1,337 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (BigIntegerField, Count, Exists, F, OuterRef, Q,
+                              Subquery, Sum, Value, Window)
+from django.db.models.functions import Cast, Coalesce, Greatest, RowNumber
+
+from users.models import Subscriber
+
+from .models import (CartIngredient, ChangeVersion, FeedItem,
+                     IngredientRecipe, Recipe, ShoppingList, Tag)
+
+FEED_BATCH_SIZE = 1000
+TAG_IDS_CACHE_KEY = 'recipes:tag_ids'
+# Теги с id больше MAX_MASK_TAG_ID в маску не попадают: старший бит
+# BigIntegerField знаковый.
+MAX_MASK_TAG_ID = 63
+
+ADD_LINK_SQL = '''
+INSERT INTO {table} ({user}, {target})
+VALUES (%s, %s)
+ON CONFLICT DO NOTHING
+RETURNING {pk}
+'''
+
+REMOVE_LINK_SQL = '''
+DELETE FROM {table}
+WHERE {user} = %s AND {target} = %s
+RETURNING {pk}
+'''
+
+
+def get_recipe_amounts(recipe_ids):
+    '''Количества ингредиентов рецептов: {ingredient_id: amount}.'''
+    return dict(
+        IngredientRecipe.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+@transaction.atomic()
+def apply_cart_changes(user_ids, deltas):
+    '''Применяет изменения {ingredient_id: delta} к итогам корзин.'''
+    deltas = {key: value for key, value in deltas.items() if value}
+    user_ids = list(user_ids)
+    if not user_ids or not deltas:
+        return
+    rows = (CartIngredient.objects.select_for_update()
+            .filter(user_id__in=user_ids, ingredient_id__in=deltas))
+    changed, dropped, existing = [], [], set()
+    for row in rows:
+        existing.add((row.user_id, row.ingredient_id))
+        row.amount += deltas[row.ingredient_id]
+        if row.amount > 0:
+            changed.append(row)
+        else:
+            dropped.append(row.pk)
+    created = [
+        CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                       amount=amount)
+        for user_id in user_ids
+        for ingredient_id, amount in deltas.items()
+        if amount > 0 and (user_id, ingredient_id) not in existing
+    ]
+    if changed:
+        CartIngredient.objects.bulk_update(changed, ['amount'])
+    if dropped:
+        CartIngredient.objects.filter(pk__in=dropped).delete()
+    if created:
+        CartIngredient.objects.bulk_create(created)
+
+
+def cart_recipes_changed(user_id, recipe_ids, sign=1):
+    '''Рецепты добавлены в корзину (sign=1) или удалены из неё (-1).'''
+    apply_cart_changes(
+        [user_id],
+        {ingredient_id: sign * amount
+         for ingredient_id, amount in get_recipe_amounts(recipe_ids).items()}
+    )
+
+
+def recipe_ingredients_changed(recipe_id, deltas):
+    '''Состав рецепта изменился: пересчитываем корзины с этим рецептом.'''
+    if not any(deltas.values()):
+        return
+    apply_cart_changes(
+        ShoppingList.objects.filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def update_counter(queryset, field, delta):
+    '''Атомарно изменяет денормализованный счётчик на delta.'''
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_of(model, field):
+    '''Подзапрос: число строк model, ссылающихся на объект по field.'''
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def get_tag_ids(version):
+    '''Словарь {slug: id} тегов из кэша.
+
+    Ключ кэша содержит версию тегов из базы: после изменения тега
+    любой процесс перестаёт читать старый словарь.
+    '''
+    key = f'{TAG_IDS_CACHE_KEY}:{version}'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_ids)
+    return tag_ids
+
+
+def tags_mask_of(through):
+    '''Подзапрос: сумма битов тегов рецепта, то есть их маска.'''
+    return Coalesce(
+        Subquery(
+            through.objects
+            .filter(recipe=OuterRef('pk'), tag_id__lte=MAX_MASK_TAG_ID)
+            .order_by()
+            .values('recipe')
+            .annotate(mask=Sum(
+                Cast(Value(1), BigIntegerField()).bitleftshift(
+                    F('tag_id') - 1),
+                output_field=BigIntegerField()
+            ))
+            .values('mask')
+        ),
+        0
+    )
+
+
+def update_tags_mask(recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        tags_mask=tags_mask_of(Recipe.tags.through))
+
+
+def filter_by_tags(queryset, tag_ids):
+    '''Рецепты, у которых есть хотя бы один из тегов tag_ids.
+
+    Проверяется маска в строке рецепта, без соединения с тегами
+    и DISTINCT. Теги вне маски проверяются подзапросом.
+    '''
+    mask = sum(1 << (tag_id - 1) for tag_id in tag_ids
+               if tag_id <= MAX_MASK_TAG_ID)
+    condition = Q(tags_match__gt=0)
+    queryset = queryset.alias(tags_match=F('tags_mask').bitand(mask))
+    extra_ids = [tag_id for tag_id in tag_ids if tag_id > MAX_MASK_TAG_ID]
+    if extra_ids:
+        queryset = queryset.alias(has_extra_tags=Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=extra_ids)
+        ))
+        condition |= Q(has_extra_tags=True)
+    return queryset.filter(condition)
+
+
+def get_author_recipes(author_ids, limit):
+    '''Последние limit рецептов каждого автора: {author_id: [recipe]}.
+
+    Рецепты нумеруются внутри автора оконной функцией ROW_NUMBER,
+    а первые limit строк отбираются во внешнем запросе, так что
+    на всех авторов уходит один запрос.
+    '''
+    ranked = (
+        Recipe.objects
+        .filter(author_id__in=author_ids)
+        .annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=F('id').desc()
+        ))
+        .values('id', 'author_id', 'name', 'image', 'cooking_time',
+                'row_number')
+        .order_by()
+    )
+    sql, params = ranked.query.sql_with_params()
+    author_recipes = {author_id: [] for author_id in author_ids}
+    for recipe in Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+        f'ORDER BY author_id, row_number',
+        (*params, limit)
+    ):
+        author_recipes[recipe.author_id].append(recipe)
+    return author_recipes
+
+
+def fill_feeds(rows):
+    '''Добавляет в ленты строки (user_id, recipe_id, author_id).'''
+    items = [FeedItem(user_id=user_id, recipe_id=recipe_id,
+                      author_id=author_id)
+             for user_id, recipe_id, author_id in rows]
+    FeedItem.objects.bulk_create(items, batch_size=FEED_BATCH_SIZE,
+                                 ignore_conflicts=True)
+    return len(items)
+
+
+def fan_out_recipe(recipe_id, author_id):
+    '''Новый рецепт попадает в ленты всех подписчиков автора.'''
+    fill_feeds(
+        (user_id, recipe_id, author_id)
+        for user_id in Subscriber.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True).iterator()
+    )
+
+
+def backfill_feed(user_id, author_id):
+    '''После подписки в ленту добавляются рецепты автора.'''
+    fill_feeds(
+        (user_id, recipe_id, author_id)
+        for recipe_id in Recipe.objects.filter(author_id=author_id)
+        .values_list('id', flat=True).iterator()
+    )
+
+
+def clear_feed(user_id, author_id):
+    '''После отписки рецепты автора убираются из ленты.'''
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def link_many(user, model, field, ids, targets):
+    '''Связывает пользователя с объектами ids через model.field.
+
+    Существование объектов и уже созданные связи проверяются двумя
+    запросами, новые строки вставляются одним bulk_create. Сигналы
+    при этом не отправляются, обновлять зависимые данные должен
+    вызывающий код. Возвращает {id: статус} и список созданных id.
+    '''
+    ids = list(dict.fromkeys(ids))
+    found = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+    existing = set(
+        model.objects.filter(user=user, **{f'{field}__in': found})
+        .values_list(f'{field}_id', flat=True)
+    )
+    created = [pk for pk in ids if pk in found and pk not in existing]
+    model.objects.bulk_create(
+        [model(user=user, **{f'{field}_id': pk}) for pk in created],
+        ignore_conflicts=True
+    )
+    statuses = {}
+    for pk in ids:
+        if pk in existing:
+            statuses[pk] = 'exists'
+        elif pk in found:
+            statuses[pk] = 'created'
+        else:
+            statuses[pk] = 'not_found'
+    return statuses, created
+
+
+def link_sql(template, model, field):
+    quote = connection.ops.quote_name
+    return template.format(
+        table=quote(model._meta.db_table),
+        user=quote(model._meta.get_field('user').column),
+        target=quote(model._meta.get_field(field).column),
+        pk=quote(model._meta.pk.column)
+    )
+
+
+def add_link(model, field, user_id, target_id):
+    '''Связывает пользователя с объектом одним INSERT ... ON CONFLICT.
+
+    Возвращает id новой строки или None, если связь уже была.
+    Внешние ключи отложены до фиксации, а внутри внешней транзакции
+    atomic() фиксирует только точку сохранения. Поэтому ключи новой
+    строки проверяются сразу: если объекта нет, IntegrityError.
+    Сигналы не отправляются.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(link_sql(ADD_LINK_SQL, model, field),
+                       [user_id, target_id])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    connection.check_constraints(table_names=[model._meta.db_table])
+    return row[0]
+
+
+def remove_link(model, field, user_id, target_id):
+    '''Удаляет связь одним DELETE ... RETURNING, True если она была.
+    Сигналы не отправляются.'''
+    with connection.cursor() as cursor:
+        cursor.execute(link_sql(REMOVE_LINK_SQL, model, field),
+                       [user_id, target_id])
+        return cursor.fetchone() is not None
+
+
+def favorites_added(user_id, recipe_ids):
+    update_counter(Recipe.objects.filter(pk__in=recipe_ids),
+                   'favorites_count', 1)
+    ChangeVersion.objects.bump(ChangeVersion.for_user(user_id))
+
+
+def favorites_removed(user_id, recipe_ids):
+    update_counter(Recipe.objects.filter(pk__in=recipe_ids),
+                   'favorites_count', -1)
+    ChangeVersion.objects.bump(ChangeVersion.for_user(user_id))
+
+
+def cart_recipes_added(user_id, recipe_ids):
+    cart_recipes_changed(user_id, recipe_ids)
+    update_counter(Recipe.objects.filter(pk__in=recipe_ids),
+                   'in_carts_count', 1)
+    ChangeVersion.objects.bump(ChangeVersion.for_user(user_id))
+
+
+def cart_recipes_removed(user_id, recipe_ids):
+    cart_recipes_changed(user_id, recipe_ids, sign=-1)
+    update_counter(Recipe.objects.filter(pk__in=recipe_ids),
+                   'in_carts_count', -1)
+    ChangeVersion.objects.bump(ChangeVersion.for_user(user_id))
+
+
+def subscriptions_added(user_id, author_ids):
+    fill_feeds(
+        (user_id, recipe_id, author_id)
+        for recipe_id, author_id in Recipe.objects
+        .filter(author_id__in=author_ids)
+        .values_list('id', 'author_id').iterator()
+    )
+    ChangeVersion.objects.bump(ChangeVersion.for_user(user_id))
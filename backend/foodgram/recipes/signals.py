@@ -0,0 +1,195 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import Subscriber, User
+
+from .models import (ChangeVersion, Favorite, Ingredient, IngredientRecipe,
+                     Recipe, ShoppingList, Tag)
+from .search import reindex_recipes
+from .services import (backfill_feed, cart_recipes_changed, clear_feed,
+                       fan_out_recipe,
+                       recipe_ingredients_changed, update_counter,
+                       update_tags_mask)
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_saved(sender, instance, created, **kwargs):
+    if created:
+        cart_recipes_changed(instance.user_id, [instance.recipe_id])
+        update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def shopping_list_deleted(sender, instance, **kwargs):
+    cart_recipes_changed(instance.user_id, [instance.recipe_id], sign=-1)
+    update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                       'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    update_counter(Recipe.objects.filter(pk=instance.recipe_id),
+                   'favorites_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        update_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', 1)
+        fan_out_recipe(instance.id, instance.author_id)
+
+
+@receiver(post_save, sender=Subscriber)
+def subscriber_saved(sender, instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriber)
+def subscriber_deleted(sender, instance, **kwargs):
+    clear_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    update_counter(User.objects.filter(pk=instance.author_id),
+                   'recipes_count', -1)
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def ingredient_recipe_presave(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (
+            IngredientRecipe.objects.filter(pk=instance.pk)
+            .values_list('ingredient_id', 'amount').first()
+        )
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def ingredient_recipe_saved(sender, instance, **kwargs):
+    deltas = {instance.ingredient_id: instance.amount}
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        ingredient_id, amount = previous
+        deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+    recipe_ingredients_changed(instance.recipe_id, deltas)
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredient_recipe_deleted(sender, instance, **kwargs):
+    recipe_ingredients_changed(instance.recipe_id,
+                               {instance.ingredient_id: -instance.amount})
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        ChangeVersion.objects.bump(ChangeVersion.RECIPES)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    ChangeVersion.objects.bump(ChangeVersion.RECIPES, ChangeVersion.TAGS)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_mask_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            update_tags_mask([instance.pk])
+            # Иначе полное сохранение экземпляра вернёт старую маску.
+            instance.refresh_from_db(fields=['tags_mask'])
+    elif action == 'pre_clear':
+        instance._tagged_recipe_ids = list(
+            instance.Tags.values_list('id', flat=True))
+    elif action == 'post_clear':
+        update_tags_mask(instance._tagged_recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        update_tags_mask(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_predelete(sender, instance, **kwargs):
+    instance._tagged_recipe_ids = list(
+        instance.Tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    update_tags_mask(instance._tagged_recipe_ids)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    ChangeVersion.objects.bump(ChangeVersion.RECIPES,
+                               ChangeVersion.INGREDIENTS)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Subscriber)
+@receiver(post_delete, sender=Subscriber)
+def user_lists_changed(sender, instance, **kwargs):
+    ChangeVersion.objects.bump(ChangeVersion.for_user(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        ChangeVersion.objects.bump(ChangeVersion.RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_changed(sender, instance, **kwargs):
+    reindex_recipes([instance.pk])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def ingredient_recipe_search_changed(sender, instance, **kwargs):
+    reindex_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_search_changed(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            reindex_recipes([instance.pk])
+    elif action == 'pre_clear':
+        reindex_recipes(instance.Tags.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        reindex_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_search_changed(sender, instance, **kwargs):
+    reindex_recipes(instance.Tags.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        reindex_recipes(Recipe.objects.filter(
+            ingredients=instance).values_list('id', flat=True))
@@ -0,0 +1,44 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from jobs.services import register
+
+from .images import process_recipe_image
+from .models import Recipe
+from .search import update_search_vectors, uses_postgres
+
+
+@register('recipes.process_image')
+def process_image(recipe_id, stale=()):
+    process_recipe_image(recipe_id, stale)
+
+
+@register('recipes.reconcile_counters')
+def reconcile_counters(batch_size=1000):
+    call_command('reconcile_counters', batch_size=batch_size,
+                 stdout=StringIO())
+
+
+@register('recipes.rebuild_feeds')
+def rebuild_feeds(batch_size=100):
+    call_command('rebuild_feeds', batch_size=batch_size, stdout=StringIO())
+
+
+@register('recipes.rebuild_search')
+def rebuild_search(batch_size=1000):
+    '''Пересчитывает поисковые векторы всех рецептов пачками.
+
+    На других базах индекс в памяти пересобирается сам при смене
+    версии рецептов.
+    '''
+    if not uses_postgres():
+        return
+    ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for recipe_id in ids.iterator():
+        batch.append(recipe_id)
+        if len(batch) >= batch_size:
+            update_search_vectors(batch)
+            batch = []
+    update_search_vectors(batch)
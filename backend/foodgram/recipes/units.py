@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.db.models import Case, CharField, F, PositiveIntegerField, Value
+from django.db.models import When
+
+# Единица измерения ингредиента -> (базовая единица, множитель).
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 250),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+# Базовая единица -> единицы для вывода, от крупной к мелкой.
+DISPLAY_UNITS = {
+    'г': (('кг', 1000), ('г', 1)),
+    'мл': (('л', 1000), ('мл', 1)),
+}
+
+
+def canonical_unit(field):
+    '''Выражение: базовая единица для поля measurement_unit.'''
+    return Case(
+        *(When(**{field: unit}, then=Value(base))
+          for unit, (base, factor) in UNIT_CONVERSIONS.items()
+          if unit != base),
+        default=F(field),
+        output_field=CharField()
+    )
+
+
+def unit_factor(field):
+    '''Выражение: множитель перевода в базовую единицу.'''
+    return Case(
+        *(When(**{field: unit}, then=Value(factor))
+          for unit, (base, factor) in UNIT_CONVERSIONS.items()
+          if factor != 1),
+        default=Value(1),
+        output_field=PositiveIntegerField()
+    )
+
+
+def to_display_unit(amount, unit):
+    '''Переводит количество в базовой единице в наиболее удобную.'''
+    for display_unit, factor in DISPLAY_UNITS.get(unit, ()):
+        if amount >= factor:
+            value = (Decimal(amount) / factor).normalize()
+            return f'{value:f}', display_unit
+    return str(amount), unit
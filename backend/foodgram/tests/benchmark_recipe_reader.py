@@ -0,0 +1,67 @@
+'''Сравнение RecipeReader и RecipeListSerializer на странице рецептов.
+
+Не входит в обычный прогон тестов, запускается явно:
+
+    python -m pytest tests/benchmark_recipe_reader.py -s
+'''
+import time
+
+import pytest
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.readers import RecipeReader
+from api.serializers import RecipeListSerializer
+from recipes.models import IngredientRecipe, Recipe
+
+PAGE_SIZE = 50
+REPEAT = 20
+
+
+def best_time(function):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+@pytest.fixture
+def page(make_recipe, make_user, ingredients):
+    authors = [make_user(f'bench{number}') for number in range(10)]
+    for number in range(PAGE_SIZE):
+        make_recipe(f'Рецепт {number}', author=authors[number % 10],
+                    ingredients=ingredients)
+
+
+def test_reader_against_serializer(page, user):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    context = {'request': request, 'favorited_recipes': set(),
+               'carted_recipes': set()}
+    queryset = Recipe.objects.all()[:PAGE_SIZE]
+
+    def serializer_path():
+        recipes = queryset.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('ingredientrecipe_set',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient').order_by('id')))
+        return RecipeListSerializer(recipes, many=True, context=context).data
+
+    def reader_path():
+        reader = RecipeReader(RecipeListSerializer.Meta.fields, context)
+        return reader.serialize(reader.values(queryset))
+
+    renderer = JSONRenderer()
+    assert (renderer.render(serializer_path())
+            == renderer.render(reader_path()))
+    serializer_time = best_time(serializer_path)
+    reader_time = best_time(reader_path)
+    print(f'\n{PAGE_SIZE} recipes, best of {REPEAT}: '
+          f'serializer {serializer_time * 1000:.2f} ms, '
+          f'reader {reader_time * 1000:.2f} ms, '
+          f'x{serializer_time / reader_time:.1f}')
@@ -0,0 +1,97 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name=username, last_name=username)
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+def token_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    return token_client(user)
+
+
+@pytest.fixture
+def author_client(author):
+    return token_client(author)
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+        )
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=f'Ингредиент {number}',
+                                  measurement_unit='г')
+        for number in range(6)
+    ]
+
+
+@pytest.fixture
+def make_recipe(author, tags, ingredients):
+    def make(name, author=author, tags=tags[:2], ingredients=ingredients[:3],
+             **kwargs):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text=f'Описание: {name}',
+            cooking_time=10, **kwargs)
+        recipe.tags.set(tags)
+        for amount, ingredient in enumerate(ingredients, start=1):
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount * 10)
+        return recipe
+    return make
+
+
+@pytest.fixture
+def recipes(make_recipe, make_user):
+    authors = [make_user(f'cook{number}') for number in range(3)]
+    return [make_recipe(f'Рецепт {number}', author=authors[number % 3])
+            for number in range(12)]
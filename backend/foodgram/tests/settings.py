@@ -0,0 +1,14 @@
+import tempfile
+
+from foodgram.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,71 @@
+import pytest
+
+from recipes.models import (CartIngredient, ChangeVersion, FeedItem,
+                            Recipe, ShoppingList)
+from users.models import Subscriber
+
+
+def statuses(response):
+    assert response.status_code == 200
+    return {item['id']: item['status'] for item in response.json()}
+
+
+def test_bulk_favorite_statuses_and_counters(user_client, user, recipes):
+    first, second = recipes[:2]
+    assert statuses(user_client.post('/api/recipes/favorite/',
+                                     {'ids': [first.id]},
+                                     format='json')) == {first.id: 'created'}
+    version = ChangeVersion.objects.get_value(ChangeVersion.for_user(user.id))
+    response = user_client.post('/api/recipes/favorite/', {
+        'ids': [first.id, second.id, second.id, 999]}, format='json')
+    assert statuses(response) == {first.id: 'exists', second.id: 'created',
+                                  999: 'not_found'}
+    assert dict(Recipe.objects.filter(pk__in=[first.id, second.id])
+                .values_list('id', 'favorites_count')) == {
+        first.id: 1, second.id: 1}
+    assert ChangeVersion.objects.get_value(
+        ChangeVersion.for_user(user.id)) != version
+
+
+def test_bulk_cart_updates_counters_and_totals(user_client, user,
+                                               make_recipe, ingredients):
+    soup = make_recipe('Суп')
+    salad = make_recipe('Салат', ingredients=ingredients[2:4])
+    response = user_client.post('/api/recipes/shopping_cart/', {
+        'ids': [soup.id, salad.id]}, format='json')
+    assert statuses(response) == {soup.id: 'created', salad.id: 'created'}
+    response = user_client.post('/api/recipes/shopping_cart/', {
+        'ids': [soup.id]}, format='json')
+    assert statuses(response) == {soup.id: 'exists'}
+    assert ShoppingList.objects.filter(user=user).count() == 2
+    assert dict(Recipe.objects.values_list('id', 'in_carts_count')) == {
+        soup.id: 1, salad.id: 1}
+    assert dict(CartIngredient.objects.filter(user=user).values_list(
+        'ingredient_id', 'amount')) == {
+            ingredients[0].id: 10, ingredients[1].id: 20,
+            ingredients[2].id: 40, ingredients[3].id: 20}
+
+
+def test_bulk_subscribe_statuses_and_feed(user_client, user, author,
+                                          make_user, make_recipe):
+    other = make_user('other')
+    make_recipe('Суп')
+    Subscriber.objects.create(user=user, author=other)
+    response = user_client.post('/api/users/subscribe/', {
+        'ids': [author.id, other.id, user.id, 999]}, format='json')
+    assert statuses(response) == {author.id: 'created', other.id: 'exists',
+                                  user.id: 'self', 999: 'not_found'}
+    assert set(Subscriber.objects.filter(user=user).values_list(
+        'author_id', flat=True)) == {author.id, other.id}
+    assert list(FeedItem.objects.filter(user=user).values_list(
+        'author_id', flat=True)) == [author.id]
+
+
+@pytest.mark.parametrize('url', ['/api/recipes/favorite/',
+                                 '/api/recipes/shopping_cart/',
+                                 '/api/users/subscribe/'])
+@pytest.mark.parametrize('ids', [[2 ** 63], [2 ** 70], [0], [], 'abc'])
+def test_bulk_rejects_invalid_ids(user_client, recipes, url, ids):
+    response = user_client.post(url, {'ids': ids}, format='json')
+    assert response.status_code == 400
+    assert 'ids' in response.json()
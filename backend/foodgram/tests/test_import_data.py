@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from recipes.management.commands.import_data import JSONArrayReader
+from recipes.models import Ingredient
+
+DOCUMENT = '''[
+  {"name": "Соль", "measurement_unit": "г"},
+  {"name": "Скобки ] и , в \\"строке\\"",
+   "measurement_unit": "\\u0448\\u0442"},
+  1.5e3, -0.25E-2, 10, 0, true, null, "]",
+  [], {}, {"nested": [1, [2e1, {"x": -3}]]}
+]'''
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7, 64 * 1024])
+def test_reader_matches_json_loads_at_any_chunk_size(chunk_size):
+    items = list(JSONArrayReader(io.StringIO(DOCUMENT), chunk_size))
+    assert items == json.loads(DOCUMENT)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4])
+@pytest.mark.parametrize('document', ['[1.5e3]', '[12345]', '[-1e+10, 2]'])
+def test_reader_keeps_numbers_cut_by_chunks(document, chunk_size):
+    items = list(JSONArrayReader(io.StringIO(document), chunk_size))
+    assert items == json.loads(document)
+
+
+@pytest.mark.parametrize('document', ['[]', ' [ ] ', '\n[\n]\n'])
+def test_reader_reads_empty_array(document):
+    assert list(JSONArrayReader(io.StringIO(document), 1)) == []
+
+
+@pytest.mark.parametrize('document', [
+    '', '{}', '[1 2]', '[1,', '[{"name": "Соль"', '[1.5e]', '[tru]'])
+def test_reader_rejects_invalid_json(document):
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONArrayReader(io.StringIO(document), 2))
+
+
+def run_import(path, *args):
+    output = io.StringIO()
+    call_command('import_data', str(path), *args, stdout=output)
+    return output.getvalue()
+
+
+def ingredient_rows():
+    return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(json.dumps([
+        {'name': 'Соль', 'measurement_unit': 'г'},
+        {'name': 'Сахар', 'measurement_unit': 'г'},
+        {'name': 'Соль', 'measurement_unit': 'г'},
+        {'name': ' Соль ', 'measurement_unit': 'щепотка'},
+        {'name': 'Мука', 'measurement_unit': 'кг'},
+        {'name': '', 'measurement_unit': 'г'},
+        {'name': 'Вода'},
+    ], ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_size', ['1', '2', '1000'])
+def test_import_skips_duplicates_and_is_idempotent(json_file, batch_size):
+    output = run_import(json_file, '--batch-size', batch_size)
+    assert 'Read: 7, new: 4, already present: 1, skipped: 2' in output
+    assert ingredient_rows() == {('Соль', 'г'), ('Сахар', 'г'),
+                                 ('Соль', 'щепотка'), ('Мука', 'кг')}
+
+    output = run_import(json_file, '--batch-size', batch_size)
+    assert 'Read: 7, new: 0, already present: 5, skipped: 2' in output
+    assert Ingredient.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_import_csv_and_dry_run(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('Соль,г\n\nСахар,г\nСоль,г\nВода\n', encoding='utf-8')
+    output = run_import(path, '--dry-run')
+    assert 'Dry run Read: 4, new: 2, already present: 1, skipped: 1' in output
+    assert not Ingredient.objects.exists()
+
+    run_import(path)
+    assert ingredient_rows() == {('Соль', 'г'), ('Сахар', 'г')}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name, content, message', [
+    ('broken.json', '[{"name": "Соль", "measurement_unit": "г"} {}]',
+     'Error decoding file!'),
+    ('ingredients.xml', '<ingredients/>', 'Unknown file format!'),
+])
+def test_import_reports_bad_files(tmp_path, name, content, message):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    assert message in run_import(path)
+    assert not Ingredient.objects.exists()
+    assert 'File not found!' in run_import(tmp_path / 'missing.json')
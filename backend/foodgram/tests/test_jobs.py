@@ -0,0 +1,132 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.services import (HANDLERS, claim_job, requeue, requeue_stale_jobs,
+                           run_job, work)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def ok(**payload):
+        calls.append(payload)
+
+    def broken(**payload):
+        raise ValueError('broken')
+
+    monkeypatch.setitem(HANDLERS, 'tests.ok', ok)
+    monkeypatch.setitem(HANDLERS, 'tests.broken', broken)
+    return calls
+
+
+def test_enqueue_skips_duplicate_of_queued_job():
+    Job.objects.enqueue('tests.ok', {'n': 1}, dedup_key='key')
+    Job.objects.enqueue('tests.ok', {'n': 2}, dedup_key='key')
+    assert list(Job.objects.values_list('payload', flat=True)) == [{'n': 1}]
+
+    claim_job('w')
+    Job.objects.enqueue('tests.ok', {'n': 3}, dedup_key='key')
+    assert Job.objects.filter(status=Job.QUEUED).get().payload == {'n': 3}
+
+
+def test_claim_takes_ready_jobs_in_order():
+    now = timezone.now()
+    later = Job.objects.create(name='tests.ok', run_at=now)
+    first = Job.objects.create(name='tests.ok',
+                               run_at=now - timedelta(minutes=1))
+    Job.objects.create(name='tests.ok', run_at=now + timedelta(hours=1))
+
+    job = claim_job('w1')
+    assert job.pk == first.pk
+    assert (job.status, job.attempts, job.worker) == (Job.RUNNING, 1, 'w1')
+    assert Job.objects.get(pk=first.pk).status == Job.RUNNING
+    assert claim_job('w2').pk == later.pk
+    assert claim_job('w3') is None
+
+
+def test_run_job_marks_done(calls):
+    Job.objects.enqueue('tests.ok', {'n': 1})
+    job = run_job(claim_job('w'))
+    assert calls == [{'n': 1}]
+    job.refresh_from_db()
+    assert (job.status, job.last_error) == (Job.DONE, '')
+    assert job.finished_at is not None and job.run_time is not None
+
+
+def test_failed_job_is_retried_with_backoff_then_failed(calls, settings):
+    settings.JOB_RETRY_DELAY = 10
+    Job.objects.enqueue('tests.broken', max_attempts=3)
+    for attempt, delay in ((1, 10), (2, 20)):
+        before = timezone.now()
+        job = run_job(claim_job('w'))
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == (Job.QUEUED, attempt)
+        assert 'ValueError: broken' in job.last_error
+        assert job.run_at >= before + timedelta(seconds=delay)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    job = run_job(claim_job('w'))
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.FAILED, 3)
+
+
+def test_unknown_handler_fails_job(calls):
+    Job.objects.enqueue('tests.missing', max_attempts=1)
+    job = run_job(claim_job('w'))
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+    assert 'Unknown job handler: tests.missing' in job.last_error
+
+
+def test_requeue_fails_job_when_duplicate_is_queued():
+    Job.objects.enqueue('tests.ok', dedup_key='key')
+    job = claim_job('w')
+    Job.objects.enqueue('tests.ok', dedup_key='key')
+    requeue(job, 'error')
+    job.refresh_from_db()
+    assert job.status == Job.FAILED
+    assert Job.objects.filter(status=Job.QUEUED).count() == 1
+
+
+def test_requeue_stale_jobs_returns_only_timed_out_jobs(settings):
+    settings.JOB_TIMEOUT = 60
+    Job.objects.enqueue('tests.ok')
+    Job.objects.enqueue('tests.ok')
+    stale, fresh = claim_job('w'), claim_job('w')
+    Job.objects.filter(pk=stale.pk).update(
+        started_at=timezone.now() - timedelta(minutes=2))
+    requeue_stale_jobs()
+    assert Job.objects.get(pk=stale.pk).status == Job.QUEUED
+    assert Job.objects.get(pk=stale.pk).last_error == 'Timed out'
+    assert Job.objects.get(pk=fresh.pk).status == Job.RUNNING
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_requeues_jobs_that_time_out_while_it_runs(
+        calls, settings, monkeypatch):
+    settings.JOB_TIMEOUT = 60
+    settings.JOB_RETRY_DELAY = 0
+    clock = [0]
+    monkeypatch.setattr('jobs.services.time.monotonic', lambda: clock[0])
+    Job.objects.enqueue('tests.ok', {'n': 1})
+    orphan = claim_job('crashed')
+
+    def crash(**payload):
+        # Исполнитель задачи orphan упал, а время ожидания вышло.
+        Job.objects.filter(pk=orphan.pk).update(
+            started_at=timezone.now() - timedelta(minutes=2))
+        clock[0] += settings.JOB_TIMEOUT
+
+    monkeypatch.setitem(HANDLERS, 'tests.crash', crash)
+    Job.objects.enqueue('tests.crash')
+    work('w', threading.Event(), burst=True)
+    orphan.refresh_from_db()
+    assert (orphan.status, orphan.attempts, orphan.worker) == (
+        Job.DONE, 2, 'w')
+    assert calls == [{'n': 1}]
@@ -0,0 +1,85 @@
+import pytest
+
+from recipes.models import CartIngredient, Favorite, Recipe, ShoppingList
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def cart_totals(user):
+    return dict(CartIngredient.objects.filter(user=user)
+                .values_list('ingredient_id', 'amount'))
+
+
+def counters(recipe):
+    recipe.refresh_from_db()
+    return recipe.favorites_count, recipe.in_carts_count
+
+
+def test_favorite_new_existing_and_removed(user_client, user, make_recipe):
+    recipe = make_recipe('Суп')
+    url = f'/api/recipes/{recipe.id}/favorite/'
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.json() == {'user': user.id, 'recipe': recipe.id}
+    assert counters(recipe) == (1, 0)
+
+    assert user_client.post(url).status_code == 201
+    assert Favorite.objects.filter(user=user).count() == 1
+    assert counters(recipe) == (1, 0)
+
+    assert user_client.delete(url).status_code == 204
+    assert not Favorite.objects.exists()
+    assert counters(recipe) == (0, 0)
+    assert user_client.delete(url).status_code == 404
+    assert counters(recipe) == (0, 0)
+
+
+def test_cart_new_existing_and_removed(user_client, user, make_recipe,
+                                       ingredients):
+    soup = make_recipe('Суп')
+    salad = make_recipe('Салат', ingredients=ingredients[2:4])
+    url = f'/api/recipes/{soup.id}/shopping_cart/'
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.json()['recipe'] == soup.id
+    assert user_client.post(
+        f'/api/recipes/{salad.id}/shopping_cart/').status_code == 201
+    assert counters(soup) == (0, 1)
+    assert cart_totals(user) == {
+        ingredients[0].id: 10, ingredients[1].id: 20,
+        ingredients[2].id: 40, ingredients[3].id: 20}
+
+    assert user_client.post(url).status_code == 400
+    assert counters(soup) == (0, 1)
+    assert ShoppingList.objects.filter(user=user).count() == 2
+
+    assert user_client.delete(url).status_code == 204
+    assert counters(soup) == (0, 0)
+    assert cart_totals(user) == {ingredients[2].id: 10,
+                                 ingredients[3].id: 20}
+    assert user_client.delete(url).status_code == 404
+    assert cart_totals(user) == {ingredients[2].id: 10,
+                                 ingredients[3].id: 20}
+
+
+@pytest.mark.parametrize('action', ['favorite', 'shopping_cart'])
+@pytest.mark.parametrize('pk', ['999', '99999999999999999999', 'abc'])
+def test_missing_recipe_is_not_found(user_client, user, recipes, action,
+                                     pk):
+    url = f'/api/recipes/{pk}/{action}/'
+    assert user_client.post(url).status_code == 404
+    assert user_client.delete(url).status_code == 404
+    assert not Favorite.objects.exists()
+    assert not ShoppingList.objects.exists()
+    assert not CartIngredient.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action', ['favorite', 'shopping_cart'])
+def test_missing_recipe_is_not_found_inside_transaction(user_client, user,
+                                                        recipes, action):
+    response = user_client.post(f'/api/recipes/999/{action}/')
+    assert response.status_code == 404
+    assert not Favorite.objects.exists()
+    assert not ShoppingList.objects.exists()
+    assert Recipe.objects.count() == len(recipes)
@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Subscriber
+
+PAGE_SIZES = (2, 6, 12)
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries), response.json()
+
+
+@pytest.mark.parametrize('limit', PAGE_SIZES)
+def test_anonymous_list_queries_do_not_depend_on_page_size(
+        anon_client, recipes, limit, django_assert_num_queries):
+    with django_assert_num_queries(5):
+        response = anon_client.get(f'/api/recipes/?limit={limit}')
+    assert len(response.json()['results']) == limit
+
+
+@pytest.mark.parametrize('limit', PAGE_SIZES)
+def test_authenticated_list_queries_do_not_depend_on_page_size(
+        user_client, user, recipes, limit, django_assert_num_queries):
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    Subscriber.objects.create(user=user, author=recipes[0].author)
+    with django_assert_num_queries(9):
+        response = user_client.get(f'/api/recipes/?limit={limit}')
+    assert len(response.json()['results']) == limit
+
+
+@pytest.mark.parametrize('url', ('/api/recipes/?limit={}',
+                                 '/api/recipes/?limit={}&cursor=',
+                                 '/api/recipes/?limit={}&tags=lunch'))
+def test_page_queries_are_constant(user_client, recipes, url):
+    # Первый запрос заполняет кэши, общие для всех страниц.
+    count_queries(user_client, url.format(1))
+    counts = {count_queries(user_client, url.format(limit))[0]
+              for limit in PAGE_SIZES}
+    assert len(counts) == 1
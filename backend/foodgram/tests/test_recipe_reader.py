@@ -0,0 +1,107 @@
+import pytest
+from django.core.files.base import ContentFile
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeListSerializer
+from recipes.models import Favorite, Recipe, ShoppingList
+from users.models import Subscriber
+
+# Наименьший корректный GIF 1x1.
+GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9'
+       b'\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00'
+       b'\x02\x02D\x01\x00;')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def expected(url, user, recipe_ids):
+    '''Тот же ответ, построенный RecipeListSerializer.'''
+    request = Request(APIRequestFactory().get(url))
+    if user is not None:
+        request.user = user
+    recipes = Recipe.objects.in_bulk(recipe_ids)
+    context = {'request': request}
+    if user is not None:
+        context['favorited_recipes'] = set(
+            Favorite.objects.filter(user=user).values_list(
+                'recipe_id', flat=True))
+        context['carted_recipes'] = set(
+            ShoppingList.objects.filter(user=user).values_list(
+                'recipe_id', flat=True))
+    return render(RecipeListSerializer(
+        [recipes[pk] for pk in recipe_ids], many=True, context=context).data)
+
+
+@pytest.fixture
+def catalog(recipes, make_recipe, author, user, tags):
+    '''Рецепты с картинкой, без картинки, без тегов и без ингредиентов,
+    а также избранное, корзина и подписки пользователя.'''
+    with_image = make_recipe('С картинкой')
+    with_image.image.save('dish.gif', ContentFile(GIF))
+    make_recipe('Без тегов', tags=[])
+    make_recipe('Без ингредиентов', ingredients=[])
+    make_recipe('Свой рецепт', author=user, tags=tags)
+    all_recipes = list(Recipe.objects.all())
+    for recipe in all_recipes[::3]:
+        Favorite.objects.create(user=user, recipe=recipe)
+    for recipe in all_recipes[1::3]:
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    Subscriber.objects.create(user=user, author=author)
+    Subscriber.objects.create(user=user, author=recipes[1].author)
+    # Подписка на себя через API невозможна, но строка может быть в базе.
+    Subscriber.objects.create(user=user, author=user)
+    return all_recipes
+
+
+URLS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=5&page=2',
+    '/api/recipes/?limit=20',
+    '/api/recipes/?limit=4&cursor=',
+    '/api/recipes/?limit=20&fields=id,name,author,is_favorited',
+    '/api/recipes/?limit=20&omit=ingredients,text',
+    '/api/recipes/?limit=20&fields=image,tags',
+    '/api/recipes/?limit=20&tags=lunch',
+    '/api/recipes/?limit=20&is_favorited=1',
+)
+
+
+@pytest.mark.parametrize('url', URLS)
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_list_matches_serializer(catalog, anon_client, user_client, user,
+                                 url, authenticated):
+    client = user_client if authenticated else anon_client
+    response = client.get(url)
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert results
+    recipe_ids = [recipe.get('id') for recipe in results]
+    if None in recipe_ids:
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:len(results)])
+    assert render(results) == expected(
+        url, user if authenticated else None, recipe_ids)
+
+
+@pytest.mark.parametrize('authenticated', (False, True))
+@pytest.mark.parametrize('query', ('', '?fields=id,author', '?omit=tags'))
+def test_detail_matches_serializer(catalog, anon_client, user_client, user,
+                                   authenticated, query):
+    client = user_client if authenticated else anon_client
+    for recipe in catalog:
+        url = f'/api/recipes/{recipe.id}/{query}'
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.content == expected(
+            url, user if authenticated else None, [recipe.id])[1:-1]
+
+
+def test_own_recipe_is_not_subscribed(catalog, user_client, user):
+    recipe = Recipe.objects.get(name='Свой рецепт')
+    author = user_client.get(f'/api/recipes/{recipe.id}/').json()['author']
+    assert author['id'] == user.id
+    assert author['is_subscribed'] is False
@@ -0,0 +1,100 @@
+import base64
+
+import pytest
+from django.db import DatabaseError
+
+from api.serializers import RecipeSerializer
+from jobs.models import Job
+from recipes.models import Favorite, Recipe, ShoppingList
+from tests.test_recipe_reader import GIF
+
+
+def test_update_keeps_counters_changed_after_load(recipes, user):
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+    serializer = RecipeSerializer(recipe, data={'name': 'Новое название'},
+                                  partial=True)
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert (recipe.favorites_count, recipe.in_carts_count) == (1, 1)
+
+
+def test_ingredient_amount_update_invalidates_cached_detail(
+        anon_client, author_client, make_recipe, ingredients):
+    recipe = make_recipe('Суп')
+    url = f'/api/recipes/{recipe.id}/'
+    assert anon_client.get(url).json()['ingredients'][0]['amount'] == 10
+    response = author_client.patch(url, {'ingredients': [
+        {'id': ingredient.id, 'amount': 99}
+        for ingredient in ingredients[:3]
+    ]}, format='json')
+    assert response.status_code == 200
+    assert anon_client.get(url).json()['ingredients'][0]['amount'] == 99
+
+
+def test_update_without_image_keeps_variants_built_after_load(recipes):
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    variants = {'thumbnail': 'recipes/variants/dish_thumbnail.jpg'}
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants=variants)
+    serializer = RecipeSerializer(recipe, data={'name': 'Новое название'},
+                                  partial=True)
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    recipe.refresh_from_db()
+    assert recipe.image_variants == variants
+    assert not Job.objects.exists()
+
+
+def test_new_image_schedules_variants_with_stale_copies(recipes):
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    variants = {'thumbnail': 'recipes/variants/dish_thumbnail.jpg'}
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants=variants)
+    image = 'data:image/gif;base64,' + base64.b64encode(GIF).decode()
+    serializer = RecipeSerializer(recipe, data={'image': image},
+                                  partial=True)
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    recipe.refresh_from_db()
+    assert recipe.image_variants == {}
+    assert Job.objects.get().payload == {
+        'recipe_id': recipe.pk, 'stale': list(variants.values())}
+
+
+def test_clearing_missing_image_does_not_schedule_variants(recipes):
+    serializer = RecipeSerializer(recipes[0], data={'image': None},
+                                  partial=True)
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    assert not Job.objects.exists()
+
+
+def test_failed_save_rolls_back_tags_and_ingredients(
+        make_recipe, tags, ingredients, monkeypatch):
+    recipe = make_recipe('Суп')
+    image = 'data:image/gif;base64,' + base64.b64encode(GIF).decode()
+    serializer = RecipeSerializer(recipe, data={
+        'name': 'Новое название', 'image': image, 'tags': [tags[2].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 99},
+                        {'id': ingredients[5].id, 'amount': 5}],
+    }, partial=True)
+    assert serializer.is_valid(), serializer.errors
+
+    def broken_save(self, *args, **kwargs):
+        raise DatabaseError('save failed')
+
+    monkeypatch.setattr(Recipe, 'save', broken_save)
+    with pytest.raises(DatabaseError):
+        serializer.save()
+    monkeypatch.undo()
+    recipe = Recipe.objects.get(pk=recipe.pk)
+    assert recipe.name == 'Суп'
+    assert list(recipe.tags.values_list('slug', flat=True)) == [
+        'breakfast', 'lunch']
+    assert sorted(recipe.ingredientrecipe_set.values_list(
+        'ingredient_id', 'amount')) == [
+            (ingredient.id, amount)
+            for ingredient, amount in zip(ingredients[:3], (10, 20, 30))]
+    assert not Job.objects.exists()
@@ -0,0 +1,68 @@
+from recipes.models import Tag
+
+
+def filtered_names(client, slugs):
+    query = '&'.join(f'tags={slug}' for slug in slugs)
+    response = client.get(f'/api/recipes/?limit=50&{query}')
+    assert response.status_code == 200
+    return {recipe['name'] for recipe in response.json()['results']}
+
+
+def test_patched_tags_are_used_by_filter(author_client, anon_client, tags,
+                                         ingredients):
+    response = author_client.post('/api/recipes/', {
+        'name': 'Омлет', 'text': 'Яйца и молоко', 'cooking_time': 5,
+        'tags': [tags[0].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 2}],
+    }, format='json')
+    assert response.status_code == 201
+    recipe_id = response.json()['id']
+    assert filtered_names(anon_client, ['breakfast']) == {'Омлет'}
+
+    response = author_client.patch(
+        f'/api/recipes/{recipe_id}/', {'tags': [tags[1].id]}, format='json')
+    assert response.status_code == 200
+    assert filtered_names(anon_client, ['lunch']) == {'Омлет'}
+    assert filtered_names(anon_client, ['breakfast']) == set()
+
+    response = author_client.patch(
+        f'/api/recipes/{recipe_id}/',
+        {'tags': [tags[0].id, tags[2].id], 'name': 'Омлет с сыром'},
+        format='json')
+    assert response.status_code == 200
+    assert filtered_names(anon_client, ['lunch']) == set()
+    assert filtered_names(anon_client, ['dinner']) == {'Омлет с сыром'}
+    assert filtered_names(anon_client, ['lunch', 'breakfast']) == {
+        'Омлет с сыром'}
+
+
+def test_full_save_after_tags_set_keeps_mask(make_recipe, tags,
+                                             anon_client):
+    recipe = make_recipe('Суп', tags=[tags[0]])
+    recipe.tags.set([tags[1]])
+    recipe.save()
+    assert filtered_names(anon_client, ['lunch']) == {'Суп'}
+    assert filtered_names(anon_client, ['breakfast']) == set()
+
+
+def test_new_tag_slug_is_accepted_after_map_cached(make_recipe, tags,
+                                                   anon_client):
+    make_recipe('Суп', tags=[tags[0]])
+    assert filtered_names(anon_client, ['breakfast']) == {'Суп'}
+    brunch = Tag.objects.create(name='Бранч', color='#00FF00',
+                                slug='brunch')
+    make_recipe('Вафли', tags=[brunch])
+    assert filtered_names(anon_client, ['brunch']) == {'Вафли'}
+
+
+def test_renamed_tag_slug_resolves_to_same_tag(make_recipe, tags,
+                                               anon_client):
+    make_recipe('Суп', tags=[tags[0]])
+    make_recipe('Салат', tags=[tags[1]])
+    assert filtered_names(anon_client, ['breakfast']) == {'Суп'}
+    tags[0].slug = 'morning'
+    tags[0].save()
+    tags[1].slug = 'breakfast'
+    tags[1].save()
+    assert filtered_names(anon_client, ['breakfast']) == {'Салат'}
+    assert filtered_names(anon_client, ['morning']) == {'Суп'}
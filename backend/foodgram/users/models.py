@@ -24,6 +24,11 @@ class User(AbstractUser):
         max_length=150,
         blank=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('id', )